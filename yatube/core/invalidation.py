@@ -0,0 +1,14 @@
+from django.db import transaction
+
+
+def now_and_on_commit(func, *args):
+    """Вызывает func(*args) сразу и ещё раз после коммита транзакции.
+
+    Так сбрасывается всё закешированное по данным, которые меняет
+    транзакция: одного сброса сразу мало — параллельный запрос успел бы
+    закешировать ещё не закоммиченное состояние, одного после коммита
+    мало — до него своя транзакция читала бы устаревший кеш.
+    Вне транзакции on_commit срабатывает сразу, и func вызывается дважды.
+    """
+    func(*args)
+    transaction.on_commit(lambda: func(*args))
@@ -0,0 +1,206 @@
+import json
+import logging
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты внутри очереди: меньше — раньше.
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 9
+
+
+def _path(func):
+    if isinstance(func, str):
+        return func
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, *args, queue='default', priority=PRIORITY_NORMAL,
+            key=None, delay=0, max_attempts=None, **kwargs):
+    """Ставит вызов func(*args, **kwargs) в очередь queue.
+
+    func — функция уровня модуля или путь к ней; аргументы должны
+    сериализоваться в JSON. Строка задачи пишется в текущей транзакции
+    и видна воркеру только после коммита. Задача с уже известным key
+    не дублируется: возвращается существующая.
+
+    При BACKGROUND_TASKS_ASYNC = False задача выполняется сразу,
+    без очереди, и возвращается None.
+    """
+    path = _path(func)
+    args_json = json.dumps(args)
+    kwargs_json = json.dumps(kwargs)
+    if not settings.BACKGROUND_TASKS_ASYNC:
+        import_string(path)(*json.loads(args_json), **json.loads(kwargs_json))
+        return None
+    job = Job(
+        func=path,
+        args=args_json,
+        kwargs=kwargs_json,
+        queue=queue,
+        priority=priority,
+        run_after=timezone.now() + timedelta(seconds=delay),
+        idempotency_key=key,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+    if key is None:
+        job.save()
+        return job
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return Job.objects.get(idempotency_key=key)
+    return job
+
+
+def get_job(job_id=None, key=None):
+    """Задача по id или ключу идемпотентности, None — если её нет."""
+    if key is not None:
+        return Job.objects.filter(idempotency_key=key).first()
+    return Job.objects.filter(pk=job_id).first()
+
+
+def claim(queue, limit):
+    """Берёт в работу готовые задачи очереди, не больше её лимита.
+
+    Лимит считается по всем воркерам: выполняющиеся задачи видны
+    в базе. Каждая задача захватывается условным UPDATE, в который
+    входит и проверка лимита, так что два воркера не возьмут одну
+    задачу и не превысят лимит вдвоём. Возвращает id задач.
+    """
+    free = limit - Job.objects.filter(queue=queue, status=Job.RUNNING).count()
+    if free <= 0:
+        return []
+    now = timezone.now()
+    candidates = (
+        Job.objects
+        .filter(queue=queue, status=Job.QUEUED, run_after__lte=now)
+        .order_by('priority', 'run_after', 'id')
+        .values_list('id', flat=True)[:free]
+    )
+    full = (
+        Job.objects
+        .filter(queue=queue, status=Job.RUNNING)
+        .values('queue')
+        .annotate(running=Count('pk'))
+        .filter(running__gte=limit)
+        .values('queue')
+    )
+    claimed = []
+    for job_id in candidates:
+        if (
+            Job.objects
+            .filter(pk=job_id, status=Job.QUEUED)
+            .exclude(queue__in=full)
+            .update(
+                status=Job.RUNNING, started=now,
+                attempts=F('attempts') + 1,
+            )
+        ):
+            claimed.append(job_id)
+    return claimed
+
+
+def retry_delay(attempts):
+    """Экспоненциальная пауза перед следующей попыткой, в секундах."""
+    return min(
+        settings.JOB_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.JOB_RETRY_MAX_DELAY,
+    )
+
+
+def _failed(job, error, **lookups):
+    if job.attempts < job.max_attempts:
+        status = Job.QUEUED
+        run_after = timezone.now() + timedelta(
+            seconds=retry_delay(job.attempts)
+        )
+    else:
+        status = Job.FAILED
+        run_after = job.run_after
+    Job.objects.filter(pk=job.pk, **lookups).update(
+        status=status, run_after=run_after, error=error,
+        finished=timezone.now(),
+    )
+
+
+@contextmanager
+def _heartbeat(job_id):
+    """Пока задача выполняется, раз в треть JOB_TIMEOUT обновляет её
+    started: requeue_stale возвращает в очередь только задачи, воркер
+    которых перестал отзываться, а не просто долгие."""
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(settings.JOB_TIMEOUT / 3):
+                Job.objects.filter(pk=job_id, status=Job.RUNNING).update(
+                    started=timezone.now()
+                )
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run(job_id):
+    """Выполняет захваченную задачу и записывает результат.
+
+    Упавшая задача возвращается в очередь с паузой retry_delay,
+    пока не кончатся попытки.
+    """
+    job = Job.objects.get(pk=job_id)
+    try:
+        func = import_string(job.func)
+        with _heartbeat(job.pk):
+            func(*json.loads(job.args), **json.loads(job.kwargs))
+    except Exception:
+        logger.exception('Задача %s (%s) завершилась ошибкой', job.pk, job)
+        _failed(job, traceback.format_exc())
+        return False
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.DONE, error='', finished=timezone.now()
+    )
+    return True
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи, от воркера которых дольше JOB_TIMEOUT
+    не было отметки (например, он был убит). Попытка при этом
+    засчитывается."""
+    deadline = timezone.now() - timedelta(seconds=settings.JOB_TIMEOUT)
+    stale = Job.objects.filter(status=Job.RUNNING, started__lt=deadline)
+    for job in stale:
+        _failed(
+            job, 'Воркер перестал отвечать',
+            status=Job.RUNNING, started__lt=deadline,
+        )
+
+
+def purge(days):
+    """Удаляет выполненные задачи старше days дней. Упавшие остаются
+    для разбора."""
+    deadline = timezone.now() - timedelta(days=days)
+    deleted, _ = Job.objects.filter(
+        status=Job.DONE, finished__lt=deadline
+    ).delete()
+    return deleted
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.replicas import replicate
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик DATABASE_REPLICAS: '
+        'замена репликации для локального запуска'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Повторять каждые N секунд (0 — один раз)',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Реплики не настроены: задайте YATUBE_DB_REPLICAS'
+            )
+        while True:
+            started = time.monotonic()
+            for alias in settings.DATABASE_REPLICAS:
+                replicate(settings.DATABASES[alias]['NAME'])
+            self.stdout.write(
+                f'Реплики обновлены за {time.monotonic() - started:.2f} с'
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
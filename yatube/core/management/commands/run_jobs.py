@@ -0,0 +1,99 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import jobs
+
+
+def _init_process():
+    # Соединения родителя после fork не годятся: дочерний процесс
+    # откроет свои при первом запросе.
+    for connection in connections.all():
+        connection.connection = None
+
+
+class Command(BaseCommand):
+    help = (
+        'Воркер очереди задач core.jobs: выполняет задачи в пуле процессов '
+        'с лимитами параллельности JOB_QUEUES'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queue',
+            action='append',
+            dest='queues',
+            help='Очередь для обработки (по умолчанию все из JOB_QUEUES)',
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            help=(
+                'Размер пула (по умолчанию сумма лимитов очередей); '
+                '0 — выполнять задачи в самом воркере'
+            ),
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=1.0,
+            help='Пауза между проверками очереди, секунд',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и выйти',
+        )
+
+    def handle(self, *args, **options):
+        queues = options['queues'] or list(settings.JOB_QUEUES)
+        unknown = set(queues) - set(settings.JOB_QUEUES)
+        if unknown:
+            raise CommandError(f'Нет очередей: {", ".join(sorted(unknown))}')
+        processes = options['processes']
+        if processes is None:
+            processes = sum(settings.JOB_QUEUES[queue] for queue in queues)
+        jobs.purge(settings.JOB_KEEP_DAYS)
+        if not processes:
+            self.work(queues, options, None)
+            return
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            # fork: дочерние процессы наследуют настроенный Django.
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=_init_process,
+        ) as pool:
+            self.work(queues, options, pool)
+
+    def work(self, queues, options, pool):
+        running = set()
+        done = failed = 0
+        while True:
+            jobs.requeue_stale()
+            claimed = 0
+            for queue in queues:
+                for job_id in jobs.claim(queue, settings.JOB_QUEUES[queue]):
+                    claimed += 1
+                    if pool is None:
+                        ok = jobs.run(job_id)
+                        done, failed = done + ok, failed + (not ok)
+                    else:
+                        running.add(pool.submit(jobs.run, job_id))
+            if running:
+                finished, running = wait(
+                    running, timeout=options['poll'],
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in finished:
+                    ok = future.result()
+                    done, failed = done + ok, failed + (not ok)
+            elif not claimed:
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+        self.stdout.write(f'Выполнено задач: {done}, с ошибкой: {failed}')
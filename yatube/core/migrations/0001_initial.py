@@ -0,0 +1,42 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, help_text='Дата', verbose_name='Дата создания')),
+                ('func', models.CharField(help_text='Путь к функции, например posts.timeline.fan_out_post', max_length=200, verbose_name='Функция')),
+                ('args', models.TextField(default='[]', verbose_name='Аргументы')),
+                ('kwargs', models.TextField(default='{}', verbose_name='Именованные')),
+                ('queue', models.CharField(default='default', help_text='Очередь со своим лимитом параллельности из JOB_QUEUES', max_length=50, verbose_name='Очередь')),
+                ('priority', models.SmallIntegerField(default=5, help_text='Меньше — раньше', verbose_name='Приоритет')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Выполнена'), ('failed', 'Ошибка')], default='queued', max_length=10, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=5, verbose_name='Максимум попыток')),
+                ('run_after', models.DateTimeField(help_text='Когда задачу можно взять в работу', verbose_name='Не раньше')),
+                ('idempotency_key', models.CharField(blank=True, help_text='Задача с тем же ключом ставится в очередь один раз', max_length=200, null=True, unique=True, verbose_name='Ключ идемпотентности')),
+                ('error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('started', models.DateTimeField(blank=True, null=True, verbose_name='Начало')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Завершение')),
+            ],
+            options={
+                'verbose_name': 'job',
+                'verbose_name_plural': 'jobs',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['queue', 'status', 'priority', 'run_after', 'id'], name='job_queue_idx'),
+        ),
+    ]
@@ -11,3 +11,92 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class UpdatedModel(CreatedModel):
+    """Абстрактная модель. Добавляет даты создания и изменения."""
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата изменения",
+        help_text='Дата последнего изменения'
+    )
+
+    class Meta:
+        abstract = True
+
+
+class Job(CreatedModel):
+    """Задача очереди core.jobs: вызов функции по пути с JSON-аргументами."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    func = models.CharField(
+        max_length=200,
+        verbose_name="Функция",
+        help_text='Путь к функции, например posts.timeline.fan_out_post'
+    )
+    args = models.TextField(default='[]', verbose_name="Аргументы")
+    kwargs = models.TextField(default='{}', verbose_name="Именованные")
+    queue = models.CharField(
+        max_length=50,
+        default='default',
+        verbose_name="Очередь",
+        help_text='Очередь со своим лимитом параллельности из JOB_QUEUES'
+    )
+    priority = models.SmallIntegerField(
+        default=5,
+        verbose_name="Приоритет",
+        help_text='Меньше — раньше'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+        verbose_name="Статус"
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name="Попыток"
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=5, verbose_name="Максимум попыток"
+    )
+    run_after = models.DateTimeField(
+        verbose_name="Не раньше",
+        help_text='Когда задачу можно взять в работу'
+    )
+    idempotency_key = models.CharField(
+        max_length=200,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name="Ключ идемпотентности",
+        help_text='Задача с тем же ключом ставится в очередь один раз'
+    )
+    error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    started = models.DateTimeField(
+        null=True, blank=True, verbose_name="Начало"
+    )
+    finished = models.DateTimeField(
+        null=True, blank=True, verbose_name="Завершение"
+    )
+
+    def __str__(self):
+        return f'{self.func} ({self.status})'
+
+    class Meta:
+        verbose_name = 'job'
+        verbose_name_plural = 'jobs'
+        indexes = [
+            models.Index(
+                fields=['queue', 'status', 'priority', 'run_after', 'id'],
+                name='job_queue_idx'
+            ),
+        ]
@@ -0,0 +1,201 @@
+import json
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_lock = threading.Lock()
+# Число идущих профилируемых запросов и методы, подменённые на их время.
+_active = 0
+_originals = []
+_missing = object()
+
+
+class Profile:
+    """Счётчики одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.db_queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.depth = {}
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0) + seconds
+
+
+def current():
+    """Profile текущего запроса или None, если профилирование выключено."""
+    return getattr(_local, 'profile', None)
+
+
+@contextmanager
+def measure(name):
+    """Добавляет время блока к метрике name текущего запроса.
+
+    Работает и как декоратор. Вложенные блоки с тем же именем
+    не считаются дважды.
+    """
+    profile = current()
+    if profile is None or profile.depth.get(name):
+        yield
+        return
+    profile.depth[name] = 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.depth[name] = 0
+        profile.add(name, time.perf_counter() - started)
+
+
+def _counted_get(method):
+    @wraps(method)
+    def get(self, key, default=None, version=None):
+        profile = current()
+        value = method(self, key, _missing, version)
+        if profile is not None and not profile.depth.get('cache'):
+            if value is _missing:
+                profile.cache_misses += 1
+            else:
+                profile.cache_hits += 1
+        return default if value is _missing else value
+    return get
+
+
+def _counted_get_many(method):
+    @wraps(method)
+    def get_many(self, keys, version=None):
+        profile = current()
+        if profile is None or profile.depth.get('cache'):
+            return method(self, keys, version)
+        keys = list(keys)
+        # get_many у части бэкендов устроен через get: не считаем дважды.
+        profile.depth['cache'] = 1
+        try:
+            found = method(self, keys, version)
+        finally:
+            profile.depth['cache'] = 0
+        profile.cache_hits += len(found)
+        profile.cache_misses += len(keys) - len(found)
+        return found
+    return get_many
+
+
+def _patches():
+    yield Template, 'render', measure('tpl')
+    for backend in {type(caches[alias]) for alias in settings.CACHES}:
+        yield backend, 'get', _counted_get
+        yield backend, 'get_many', _counted_get_many
+
+
+@contextmanager
+def _instrumented():
+    """Оборачивает рендер шаблонов и чтение кеша, пока идёт хотя бы один
+    профилируемый запрос, и затем возвращает исходные методы: вне
+    профилирования код Django остаётся нетронутым."""
+    global _active
+    with _lock:
+        if not _active:
+            for owner, name, wrap in _patches():
+                _originals.append((owner, name, owner.__dict__.get(name)))
+                setattr(owner, name, wrap(getattr(owner, name)))
+        _active += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _active -= 1
+            if not _active:
+                while _originals:
+                    owner, name, original = _originals.pop()
+                    if original is None:
+                        delattr(owner, name)
+                    else:
+                        setattr(owner, name, original)
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    profile = current()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if profile is not None:
+            profile.db_queries += 1
+            profile.add('db', time.perf_counter() - started)
+
+
+def server_timing(profile, total):
+    metrics = [f'total;dur={total * 1000:.1f}']
+    descriptions = {
+        'db': f'{profile.db_queries} queries',
+        'tpl': 'templates',
+        'thumb': 'thumbnails',
+    }
+    for name, seconds in profile.durations.items():
+        description = descriptions.get(name, name)
+        metrics.append(
+            f'{name};dur={seconds * 1000:.1f};desc="{description}"'
+        )
+    metrics.append(
+        f'cache;desc="{profile.cache_hits} hits, '
+        f'{profile.cache_misses} misses"'
+    )
+    return ', '.join(metrics)
+
+
+class ProfilingMiddleware:
+    """Время SQL, шаблонов и миниатюр, число запросов и попаданий
+    в кеш — в заголовке Server-Timing и в строке лога core.profiling.
+
+    Включается настройкой REQUEST_PROFILING; выключенный middleware
+    Django не загружает вовсе.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = Profile()
+        _local.profile = profile
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(_instrumented())
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_db_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        total = time.perf_counter() - profile.started
+        response['Server-Timing'] = server_timing(profile, total)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_queries': profile.db_queries,
+            **{
+                f'{name}_ms': round(seconds * 1000, 1)
+                for name, seconds in profile.durations.items()
+            },
+            'cache_hits': profile.cache_hits,
+            'cache_misses': profile.cache_misses,
+        }))
+        return response
@@ -0,0 +1,122 @@
+import random
+import sqlite3
+import threading
+from contextlib import closing
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_local = threading.local()
+
+# Сессии читаются только с основной базы: только что созданная
+# сессия могла ещё не доехать до реплики.
+PRIMARY_ONLY_APPS = ('sessions',)
+
+
+# Закрепление за основной базой живёт в подписанной cookie: так его
+# видит любой процесс, а подпись с меткой времени не даёт продлить его
+# или подделать.
+PIN_COOKIE = 'primary_pin'
+PIN_SALT = 'core.replicas.pin'
+
+
+def pin_to_primary(response):
+    """Следующие REPLICA_PIN_SECONDS клиент читает с основной базы
+    и видит свои изменения, даже если реплика от неё отстаёт."""
+    response.set_signed_cookie(
+        PIN_COOKIE, '1', salt=PIN_SALT,
+        max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+    )
+
+
+def is_pinned(request):
+    return request.get_signed_cookie(
+        PIN_COOKIE, default=None, salt=PIN_SALT,
+        max_age=settings.REPLICA_PIN_SECONDS,
+    ) is not None
+
+
+def reading_from_replica():
+    return getattr(_local, 'replica', False)
+
+
+def page_timeout():
+    """Срок кеша страницы: собранная с реплики могла отстать от
+    поколения кеша, поэтому хранится не дольше REPLICA_PAGE_TTL."""
+    return settings.REPLICA_PAGE_TTL if reading_from_replica() else None
+
+
+def read_from_replica(view):
+    """Запросы чтения внутри GET-view уходят на реплику.
+
+    Если реплик нет или клиент только что писал — на основную.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or not settings.DATABASE_REPLICAS
+            or is_pinned(request)
+        ):
+            return view(request, *args, **kwargs)
+        previous = reading_from_replica()
+        _local.replica = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _local.replica = previous
+    return wrapper
+
+
+class ReplicaRouter:
+    """Чтение — с реплики внутри read_from_replica, запись и всё
+    остальное — в основную базу. Реплики не мигрируются: схему
+    вместе с данными приносит replicate."""
+
+    def db_for_read(self, model, **hints):
+        if (
+            reading_from_replica()
+            and model._meta.app_label not in PRIMARY_ONLY_APPS
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class PinAfterWriteMiddleware:
+    """После успешного изменяющего запроса закрепляет клиента
+    за основной базой: read-your-writes для ленты и профиля."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+            and response.status_code < 400
+        ):
+            pin_to_primary(response)
+        return response
+
+
+def replicate(target_path, using=DEFAULT_DB_ALIAS, pages=1024):
+    """Копирует базу SQLite using в файл target_path.
+
+    Замена настоящей репликации для локального запуска: онлайн-бэкап
+    SQLite порциями по pages страниц, читатели реплики не прерываются.
+    """
+    connection = connections[using]
+    connection.ensure_connection()
+    with closing(sqlite3.connect(target_path)) as target:
+        connection.connection.backup(target, pages=pages)
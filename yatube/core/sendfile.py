@@ -0,0 +1,155 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, quote_etag
+from django.views.static import was_modified_since
+
+# Один диапазон: bytes=0-499, bytes=500- или bytes=-500 (последние 500).
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_etag(stat):
+    """ETag по времени изменения и размеру, без чтения файла."""
+    return quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+
+
+def parse_range(header, size):
+    """(start, end) включительно для заголовка Range.
+
+    None — заголовка нет или он не из одного диапазона байтов: тогда
+    отдаётся весь файл. ValueError — диапазон за пределами файла.
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError('Пустой диапазон')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError('Диапазон вне файла')
+    return start, end
+
+
+class FileRange:
+    """Часть открытого файла как file-like объект для FileResponse.
+
+    Читает не дальше конца диапазона; имени нет специально, чтобы
+    FileResponse не выставил Content-Length всего файла.
+    """
+
+    def __init__(self, file, start, end):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = end - start + 1
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _not_modified(request, stat, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        tags = parse_etags(if_none_match)
+        return '*' in tags or etag in tags
+    return not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'),
+        stat.st_mtime,
+        stat.st_size,
+    )
+
+
+def _range_allowed(request, stat, etag):
+    """If-Range: диапазон отдаётся, только если файл не изменился."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is None:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return not was_modified_since(if_range, stat.st_mtime, stat.st_size)
+
+
+def _offload(full_path, root, response):
+    """Передаёт отдачу файла веб-серверу по MEDIA_SENDFILE_BACKEND."""
+    backend = settings.MEDIA_SENDFILE_BACKEND
+    if backend == 'nginx':
+        relative = os.path.relpath(full_path, root).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_PREFIX + quote(relative)
+        )
+    elif backend == 'apache':
+        response['X-Sendfile'] = full_path
+    else:
+        raise ValueError(f'Неизвестный MEDIA_SENDFILE_BACKEND: {backend}')
+    return response
+
+
+def sendfile(request, full_path, root):
+    """Ответ с файлом full_path из каталога root.
+
+    Если настроен MEDIA_SENDFILE_BACKEND, байты отдаёт nginx
+    (X-Accel-Redirect) или Apache (X-Sendfile), а Django только
+    проверяет доступ. Иначе файл читается блоками через FileResponse
+    с поддержкой Range, ETag и If-None-Match.
+    """
+    stat = os.stat(full_path)
+    etag = file_etag(stat)
+    if _not_modified(request, stat, etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    content_type, encoding = mimetypes.guess_type(full_path)
+    if encoding or not content_type:
+        content_type = 'application/octet-stream'
+
+    if settings.MEDIA_SENDFILE_BACKEND:
+        response = _offload(
+            full_path, root, HttpResponse(content_type=content_type)
+        )
+    else:
+        response = _stream(request, full_path, stat, etag, content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
+
+
+def _stream(request, full_path, stat, etag, content_type):
+    size = stat.st_size
+    requested = None
+    if 'HTTP_RANGE' in request.META and _range_allowed(request, stat, etag):
+        try:
+            requested = parse_range(request.META['HTTP_RANGE'], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    file = open(full_path, 'rb')
+    if requested is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = requested
+        response = FileResponse(
+            FileRange(file, start, end), content_type=content_type,
+            status=206,
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,90 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Что имеет смысл сжимать: картинки и шрифты уже сжаты.
+COMPRESSIBLE = ('.css', '.js', '.svg', '.map', '.txt', '.json', '.xml')
+
+# Расширения заранее сжатых копий в порядке предпочтения клиенту.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def compress(content):
+    """Сжатые варианты содержимого: {расширение: байты}.
+
+    Вариант попадает в результат, только если он меньше исходника.
+    """
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content)
+    return {
+        suffix: data for suffix, data in variants.items()
+        if len(data) < len(content)
+    }
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем содержимого в имени и сжатыми копиями рядом.
+
+    collectstatic пишет для каждого css/js/... файл.<hash>.css.gz
+    и, если установлен brotli, файл.<hash>.css.br. Файлы, которых
+    нет в манифесте (например, до первого collectstatic), отдаются
+    по исходному имени вместо ошибки.
+    """
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        # Файлы со ссылками обрабатываются в несколько проходов:
+        # сжимаем только итоговые версии, после всех проходов.
+        final = {}
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if hashed_name and not isinstance(processed, Exception):
+                final[name] = hashed_name
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name, hashed_name in final.items():
+            self._write_compressed(name)
+            self._write_compressed(hashed_name)
+
+    def _write_compressed(self, name):
+        if not name.endswith(COMPRESSIBLE):
+            return
+        with self.open(name) as original:
+            content = original.read()
+        for suffix, data in compress(content).items():
+            path = name + suffix
+            if self.exists(path):
+                self.delete(path)
+            self._save(path, ContentFile(data))
+
+
+def compressed_path(path, accept_encoding):
+    """Путь к лучшей заранее сжатой копии файла и её кодировка.
+
+    Без подходящей копии — путь к самому файлу и None.
+    """
+    accepted = set()
+    for part in accept_encoding.lower().split(','):
+        encoding, _, params = part.partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00'):
+            accepted.add(encoding.strip())
+    for encoding, suffix in ENCODINGS:
+        if encoding in accepted and os.path.exists(path + suffix):
+            return path + suffix, encoding
+    return path, None
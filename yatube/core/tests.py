@@ -0,0 +1,413 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import QuerySet
+from django.test import (
+    RequestFactory, TestCase, TransactionTestCase, override_settings
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from core import jobs
+from core.invalidation import now_and_on_commit
+from core.models import Job
+from core.replicas import (
+    PIN_COOKIE, ReplicaRouter, read_from_replica, replicate
+)
+from posts.models import Post
+
+User = get_user_model()
+
+STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(STATIC_ROOT=STATIC_ROOT)
+class StaticFilesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('collectstatic', interactive=False, stdout=StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(STATIC_ROOT, ignore_errors=True)
+
+    def test_templates_use_hashed_names(self):
+        """Шаблоны ссылаются на файлы с хешем содержимого."""
+        response = self.client.get('/about/author/')
+        css = staticfiles_storage.url('css/bootstrap.min.css')
+
+        self.assertRegex(css, r'bootstrap\.min\.[0-9a-f]{12}\.css$')
+        self.assertContains(response, css)
+
+    def test_precompressed_variant(self):
+        """Сжатая копия выбирается по Accept-Encoding."""
+        url = staticfiles_storage.url('css/bootstrap.min.css')
+        cases = {
+            'br, gzip': 'br',
+            'gzip': 'gzip',
+            'gzip;q=0, identity': None,
+            '': None,
+        }
+        for accept, encoding in cases.items():
+            with self.subTest(accept=accept):
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING=accept)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.get('Content-Encoding'), encoding)
+                self.assertEqual(response['Content-Type'], 'text/css')
+                self.assertEqual(response['Vary'], 'Accept-Encoding')
+                self.assertIn('immutable', response['Cache-Control'])
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        original = self.client.get(url)
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)),
+            b''.join(original.streaming_content),
+        )
+
+    def test_unhashed_and_missing(self):
+        """Файлы без хеша кешируются ненадолго, отсутствующие — 404."""
+        response = self.client.get('/static/img/logo.png')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertIsNone(response.get('Content-Encoding'))
+        for path in ('/static/missing.css', '/static/../manage.py'):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path).status_code, 404)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class MediaFilesTests(TestCase):
+    content = bytes(range(256)) * 40
+    url = '/media/posts/image.bin'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(MEDIA_ROOT, 'posts'))
+        with open(os.path.join(MEDIA_ROOT, 'posts', 'image.bin'), 'wb') as f:
+            f.write(cls.content)
+        with open(os.path.join(MEDIA_ROOT, 'secret.txt'), 'w') as f:
+            f.write('secret')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_full_file(self):
+        """Файл отдаётся целиком с ETag и Accept-Ranges."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['ETag'].startswith('"'))
+
+    def test_range(self):
+        """Range отдаёт только запрошенные байты."""
+        size = len(self.content)
+        cases = {
+            'bytes=0-99': (0, 99),
+            'bytes=10000-': (10000, size - 1),
+            'bytes=-240': (size - 240, size - 1),
+            'bytes=100-99999': (100, size - 1),
+        }
+        for header, (start, end) in cases.items():
+            with self.subTest(range=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(
+                    b''.join(response.streaming_content),
+                    self.content[start:end + 1],
+                )
+                self.assertEqual(
+                    response['Content-Range'], f'bytes {start}-{end}/{size}'
+                )
+                self.assertEqual(
+                    response['Content-Length'], str(end - start + 1)
+                )
+        response = self.client.get(self.url, HTTP_RANGE='bytes=99999-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{size}')
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, 200)
+
+    def test_conditional(self):
+        """If-None-Match и If-Range сверяются с ETag."""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag
+        )
+        self.assertEqual(response.status_code, 206)
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"other"'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_access(self):
+        """Вне MEDIA_SERVED_DIRS и скрытые файлы не отдаются."""
+        for url in (
+            '/media/secret.txt',
+            '/media/posts/../secret.txt',
+            '/media/posts/.hidden',
+            '/media/posts/missing.bin',
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_offload(self):
+        """С MEDIA_SENDFILE_BACKEND байты отдаёт веб-сервер."""
+        path = os.path.join(MEDIA_ROOT, 'posts', 'image.bin')
+        cases = {
+            'nginx': ('X-Accel-Redirect', '/protected-media/posts/image.bin'),
+            'apache': ('X-Sendfile', path),
+        }
+        for backend, (header, value) in cases.items():
+            with self.subTest(backend=backend):
+                with self.settings(MEDIA_SENDFILE_BACKEND=backend):
+                    response = self.client.get(self.url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response[header], value)
+                self.assertEqual(response.content, b'')
+                self.assertIn('ETag', response)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, method='get', user=None, model=Post, cookies=None):
+        """Куда уходит чтение внутри view под read_from_replica."""
+        request = getattr(self.factory, method)('/')
+        request.user = user or AnonymousUser()
+        request.COOKIES.update(cookies or {})
+        return read_from_replica(
+            lambda request: self.router.db_for_read(model)
+        )(request)
+
+    def test_reads_go_to_replica(self):
+        """Чтение в GET-view — с реплики, вне его и в POST — с основной."""
+        self.assertEqual(self.route(), 'replica')
+        self.assertEqual(self.route(user=self.user), 'replica')
+        self.assertEqual(self.route('post'), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.route(), 'default')
+
+    def test_sessions_and_migrations_stay_on_primary(self):
+        """Сессии читаются и миграции идут только на основной базе."""
+        self.assertEqual(self.route(model=Session), 'default')
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+
+    def test_read_your_writes(self):
+        """После комментария автор читает с основной базы."""
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'},
+        )
+        pin = {PIN_COOKIE: response.cookies[PIN_COOKIE].value}
+        self.assertEqual(self.route(user=self.user, cookies=pin), 'default')
+        self.assertEqual(self.route(user=self.user), 'replica')
+        with self.settings(REPLICA_PIN_SECONDS=-1):
+            self.assertEqual(self.route(cookies=pin), 'replica')
+        self.assertEqual(self.route(cookies={PIN_COOKIE: '1'}), 'replica')
+
+
+class ReplicateTests(TransactionTestCase):
+    def test_replicate(self):
+        """replicate копирует основную базу в файл SQLite."""
+        user = User.objects.create_user(username='writer')
+        Post.objects.create(author=user, text='Пост')
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'replica.sqlite3')
+        replicate(path)
+        with closing(sqlite3.connect(path)) as replica:
+            texts = replica.execute('SELECT text FROM posts_post').fetchall()
+        self.assertEqual(texts, [('Пост',)])
+
+
+CALLS = []
+
+
+def record(value, twice=False):
+    CALLS.append(value * 2 if twice else value)
+
+
+def explode():
+    raise ValueError('Сбой')
+
+
+@override_settings(BACKGROUND_TASKS_ASYNC=True)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue_and_run(self):
+        """Задача выполняется воркером с сохранёнными аргументами."""
+        job = jobs.enqueue(record, 2, twice=True)
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.func, 'core.tests.record')
+        self.assertEqual(CALLS, [])
+
+        call_command('run_jobs', once=True, processes=0, stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(CALLS, [4])
+
+    def test_eager_mode(self):
+        """Без BACKGROUND_TASKS_ASYNC задача выполняется сразу."""
+        with self.settings(BACKGROUND_TASKS_ASYNC=False):
+            self.assertIsNone(jobs.enqueue(record, 1))
+        self.assertEqual(CALLS, [1])
+        self.assertFalse(Job.objects.exists())
+
+    def test_idempotency_key(self):
+        """Задача с тем же ключом ставится один раз."""
+        first = jobs.enqueue(record, 1, key='once')
+        second = jobs.enqueue(record, 2, key='once')
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(jobs.get_job(key='once').pk, first.pk)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_priority_and_queue_limit(self):
+        """Важные задачи берутся первыми, но не сверх лимита очереди."""
+        low = jobs.enqueue(record, 1, priority=jobs.PRIORITY_LOW)
+        normal = jobs.enqueue(record, 2)
+        high = jobs.enqueue(record, 3, priority=jobs.PRIORITY_HIGH)
+        jobs.enqueue(record, 4, queue='email')
+
+        self.assertEqual(jobs.claim('default', 2), [high.pk, normal.pk])
+        self.assertEqual(jobs.claim('default', 2), [])
+        jobs.run(high.pk)
+        self.assertEqual(jobs.claim('default', 2), [low.pk])
+
+    def test_queue_limit_in_update(self):
+        """Лимит очереди держится, даже если счёт занятых устарел."""
+        jobs.enqueue(record, 1)
+        jobs.enqueue(record, 2)
+        self.assertEqual(len(jobs.claim('default', 1)), 1)
+
+        # Так выглядит гонка: другой воркер занял место после подсчёта.
+        with mock.patch.object(QuerySet, 'count', return_value=0):
+            self.assertEqual(jobs.claim('default', 1), [])
+
+    def test_retry_with_backoff(self):
+        """Упавшая задача повторяется с растущей паузой до max_attempts."""
+        job = jobs.enqueue(explode, max_attempts=2)
+        jobs.claim('default', 1)
+        before = timezone.now()
+
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertFalse(jobs.run(job.pk))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('ValueError', job.error)
+        self.assertGreaterEqual(
+            job.run_after, before + timedelta(seconds=jobs.retry_delay(1))
+        )
+        self.assertEqual(jobs.claim('default', 1), [])
+        self.assertGreater(jobs.retry_delay(3), jobs.retry_delay(2))
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        jobs.claim('default', 1)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.run(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_requeue_stale(self):
+        """Зависшая задача возвращается в очередь."""
+        job = jobs.enqueue(record, 1)
+        jobs.claim('default', 1)
+        Job.objects.filter(pk=job.pk).update(
+            started=timezone.now() - timedelta(
+                seconds=settings.JOB_TIMEOUT + 1
+            )
+        )
+
+        jobs.requeue_stale()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+
+
+def stay_running():
+    time.sleep(0.3)
+    jobs.requeue_stale()
+    CALLS.append(jobs.get_job(key='slow').status)
+
+
+@override_settings(BACKGROUND_TASKS_ASYNC=True, JOB_TIMEOUT=0.15)
+class JobHeartbeatTests(TransactionTestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_long_job_not_requeued(self):
+        """Долгую задачу живого воркера requeue_stale не трогает."""
+        jobs.enqueue(stay_running, key='slow')
+
+        call_command('run_jobs', once=True, processes=0, stdout=StringIO())
+
+        self.assertEqual(CALLS, [Job.RUNNING])
+        job = jobs.get_job(key='slow')
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+
+
+class InvalidationTests(TransactionTestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_now_and_on_commit(self):
+        """Сброс выполняется сразу и повторно после коммита."""
+        with transaction.atomic():
+            now_and_on_commit(record, 1)
+            self.assertEqual(CALLS, [1])
+        self.assertEqual(CALLS, [1, 1])
+
+    def test_rollback(self):
+        """После отката повторного сброса нет."""
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                now_and_on_commit(record, 1)
+                explode()
+        self.assertEqual(CALLS, [1])
@@ -1,4 +1,20 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .sendfile import sendfile
+from .storage import compressed_path
+
+# Имя с хешем содержимого от ManifestStaticFilesStorage: logo.1a2b3c4d5e6f.png
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
 
 
 def page_not_found(request, exception):
@@ -12,3 +28,64 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def static_file(request, path):
+    """Отдаёт собранную статику из STATIC_ROOT.
+
+    Выбирает заранее сжатую копию по Accept-Encoding; файлы с хешем
+    в имени кешируются клиентом навсегда.
+    """
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    served, encoding = compressed_path(
+        full_path, request.META.get('HTTP_ACCEPT_ENCODING', '')
+    )
+    stat = os.stat(served)
+    if not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'),
+        stat.st_mtime,
+        stat.st_size,
+    ):
+        return HttpResponseNotModified()
+    content_type, _ = mimetypes.guess_type(full_path)
+    response = FileResponse(
+        open(served, 'rb'),
+        content_type=content_type or 'application/octet-stream',
+    )
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if HASHED_NAME.search(path):
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+
+def media_file(request, path):
+    """Отдаёт загруженный файл из MEDIA_ROOT.
+
+    Доступны только каталоги MEDIA_SERVED_DIRS и не скрытые файлы;
+    остальное — 404, даже если файл существует.
+    """
+    parts = path.split('/')
+    if (
+        not path.startswith(settings.MEDIA_SERVED_DIRS)
+        or any(part.startswith('.') for part in parts)
+    ):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    response = sendfile(request, full_path, settings.MEDIA_ROOT)
+    response['Cache-Control'] = 'public, max-age=86400'
+    return response
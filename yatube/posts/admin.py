@@ -1,7 +1,25 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+from django.shortcuts import render
+from django.utils import timezone
+
+from . import cache, search
 from .models import Post, Group
 
 
+class MoveToGroupForm(forms.Form):
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.all(),
+        required=False,
+        label='Группа',
+        empty_label='Без группы',
+    )
+
+
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     list_display = (
@@ -12,9 +30,73 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('created',)
     empty_value_display = '-пусто-'
+    raw_id_fields = ('author',)
+    # Число строк считается один раз, для пагинации: второй COUNT(*)
+    # по всей таблице ради «из N всего» не нужен.
+    show_full_result_count = False
+    actions = ('move_to_group',)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        """Выбор группы в каждой строке берёт варианты из одного
+        запроса на всю страницу."""
+        formfield = super().formfield_for_foreignkey(
+            db_field, request, **kwargs
+        )
+        if db_field.name == 'group' and formfield is not None:
+            if not hasattr(request, '_group_choices'):
+                request._group_choices = list(formfield.choices)
+            formfield.choices = request._group_choices
+        return formfield
+
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по FTS-индексу вместо LIKE по всей таблице."""
+        connection = connections[queryset.db]
+        match = search.to_match_query(search_term)
+        if not search.is_supported(connection) or match is None:
+            return super().get_search_results(request, queryset, search_term)
+        queryset = queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {search.FTS_TABLE} '
+            f'WHERE {search.FTS_TABLE} MATCH %s',
+            [match],
+        ))
+        return queryset, False
+
+    def move_to_group(self, request, queryset):
+        """Переносит выбранные посты в группу одним UPDATE."""
+        data = request.POST if 'apply' in request.POST else None
+        form = MoveToGroupForm(data)
+        if not form.is_valid():
+            return render(request, 'admin/posts/post/move_to_group.html', {
+                **self.admin_site.each_context(request),
+                'title': 'Перенести посты в группу',
+                'opts': self.model._meta,
+                'form': form,
+                'posts': queryset[:20],
+                'count': queryset.order_by().count(),
+                'selected': request.POST.getlist(
+                    helpers.ACTION_CHECKBOX_NAME
+                ),
+                'select_across': request.POST.get('select_across', '0'),
+                'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+            })
+        group = form.cleaned_data['group']
+        with transaction.atomic():
+            moved = queryset.order_by().update(
+                group=group,
+                version=F('version') + 1,
+                updated=timezone.now(),
+            )
+            # Поменялись страницы групп и профилей: сбрасываем их все.
+            cache.bump('index', 'groups')
+        self.message_user(
+            request, f'Перенесено постов: {moved}', messages.SUCCESS
+        )
+        return None
+    move_to_group.short_description = 'Перенести выбранные посты в группу'
 
 
 admin.site.register(Group)
@@ -0,0 +1,172 @@
+from django.db import connection, transaction
+from django.db.models import Count
+from django.http import Http404
+
+from . import cache, counters
+from .models import (
+    ArchivedComment, ArchivedPost, Comment, Group, Post, TimelineEntry,
+    User
+)
+
+
+class TieredPosts:
+    """Посты автора для Paginator: сначала горячие, затем архивные.
+
+    В архив уходят только посты старше порога, поэтому простое
+    сцепление сохраняет порядок -created, -id. Архив читается,
+    только когда страница до него доходит. CursorPaginator листает
+    части по очереди через tiers.
+    """
+
+    def __init__(self, hot, archived, archived_count):
+        self.hot = hot
+        self.archived = archived
+        self.archived_count = archived_count
+        self._hot_count = None
+
+    @property
+    def tiers(self):
+        return [self.hot, self.archived]
+
+    def hot_count(self):
+        if self._hot_count is None:
+            self._hot_count = self.hot.count()
+        return self._hot_count
+
+    def count(self):
+        return self.hot_count() + self.archived_count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop = key.start or 0, key.stop
+        hot_count = self.hot_count()
+        rows = []
+        if start < hot_count:
+            rows.extend(self.hot[start:min(stop, hot_count)])
+        if stop > hot_count:
+            rows.extend(
+                self.archived[max(start - hot_count, 0):stop - hot_count]
+            )
+        return rows
+
+
+def with_archived(posts, author):
+    """posts автора плюс его архив, если там что-то есть.
+
+    Число архивных постов берётся из счётчиков автора, так что
+    для авторов без архива это тот же queryset без лишних запросов.
+    """
+    user_counters = getattr(author, 'counters', None)
+    if user_counters is None or not user_counters.archived_posts_count:
+        return posts
+    archived = (
+        ArchivedPost.objects
+        .select_related('author', 'group')
+        .filter(author=author)
+    )
+    return TieredPosts(posts, archived, user_counters.archived_posts_count)
+
+
+def get_archived_post(post_id, queryset=ArchivedPost.objects):
+    """Архивный пост по id или 404."""
+    post = queryset.filter(pk=post_id).first()
+    if post is None:
+        raise Http404
+    return post
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _copy_rows(source, target, column, ids):
+    columns = ', '.join(
+        _quote(field.column) for field in target._meta.concrete_fields
+    )
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {_quote(target._meta.db_table)} ({columns}) '
+            f'SELECT {columns} FROM {_quote(source._meta.db_table)} '
+            f'WHERE {_quote(column)} IN ({placeholders})',
+            ids,
+        )
+
+
+def _delete_rows(model, column, ids):
+    # Без сигналов: пост не удаляется, а переезжает, и счётчики
+    # постов автора, подписки и кеш правятся здесь одним разом.
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {_quote(model._meta.db_table)} '
+            f'WHERE {_quote(column)} IN ({placeholders})',
+            ids,
+        )
+
+
+def archive_posts(post_ids):
+    """Переносит посты с комментариями в архивные таблицы.
+
+    Записи лент подписок удаляются: лента показывает только
+    горячие посты. Возвращает число перенесённых комментариев.
+    """
+    with transaction.atomic():
+        _copy_rows(Post, ArchivedPost, 'id', post_ids)
+        _copy_rows(Comment, ArchivedComment, 'post_id', post_ids)
+        comments = ArchivedComment.objects.filter(
+            post_id__in=post_ids
+        ).count()
+        by_author = (
+            ArchivedPost.objects
+            .filter(pk__in=post_ids)
+            .order_by()
+            .values('author_id')
+            .annotate(total=Count('pk'))
+        )
+        for row in by_author:
+            counters.change_user_counters(
+                row['author_id'], archived_posts_count=row['total']
+            )
+        _delete_rows(TimelineEntry, 'post_id', post_ids)
+        _delete_rows(Comment, 'post_id', post_ids)
+        _delete_rows(Post, 'id', post_ids)
+        usernames = User.objects.filter(
+            pk__in={row['author_id'] for row in by_author}
+        ).values_list('username', flat=True)
+        slugs = Group.objects.filter(
+            archived_posts__pk__in=post_ids
+        ).values_list('slug', flat=True).distinct()
+        cache.bump(
+            'index',
+            *(f'profile:{username}' for username in usernames),
+            *(f'group:{slug}' for slug in slugs),
+        )
+    return comments
+
+
+def archive_older_than(cutoff, batch_size=500, progress=None):
+    """Архивирует посты, созданные раньше cutoff, пачками по batch_size.
+
+    Каждая пачка — отдельная транзакция, так что горячие таблицы
+    не блокируются надолго. Возвращает число постов и комментариев.
+    """
+    posts = comments = 0
+    while True:
+        post_ids = list(
+            Post.objects
+            .filter(created__lt=cutoff)
+            .order_by('created', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not post_ids:
+            break
+        comments += archive_posts(post_ids)
+        posts += len(post_ids)
+        if progress is not None:
+            progress(posts, comments)
+    return posts, comments
@@ -0,0 +1,201 @@
+import statistics
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import urls
+from .models import Group, Post, User
+
+# Представления, которые меняют данные: их в замеры не берём.
+SKIP = {'add_comment', 'profile_follow', 'profile_unfollow'}
+
+# Кому доступна страница; остальные страницы открывают и аноним,
+# и читатель. Под другими пользователями такие страницы отдают
+# редирект на вход или 404 — это не то, что хочется замерять.
+ACCESS = {
+    'post_create': 'authenticated',
+    'follow_index': 'authenticated',
+    'post_edit': 'author',
+    'profile_export': 'author',
+    'group_export': 'staff',
+}
+PUBLIC = ('anonymous', 'authenticated')
+
+# Дополнительные GET-параметры для отдельных страниц.
+QUERY = {
+    'search': lambda post: {'q': post.text.split()[0]},
+}
+
+
+def _percentile(values, share):
+    values = sorted(values)
+    index = min(len(values) - 1, round(share * (len(values) - 1)))
+    return values[index]
+
+
+def heaviest_author():
+    """Автор с наибольшим числом постов."""
+    return User.objects.order_by('-counters__posts_count').first()
+
+
+def targets():
+    """Адреса всех GET-страниц posts.urls с реальными аргументами
+    и теми, кто может их открыть (см. ACCESS).
+
+    Берутся самые «тяжёлые» объекты: автор с наибольшим числом
+    постов, его последний пост, группа этого поста.
+    """
+    author = heaviest_author()
+    post = Post.objects.filter(author=author).order_by('-created').first()
+    group = Group.objects.filter(posts__author=author).first()
+    if post is None or group is None:
+        raise ValueError('Для замеров нужны посты в группах')
+    arguments = {
+        'slug': group.slug,
+        'username': author.username,
+        'post_id': post.pk,
+    }
+    for pattern in urls.urlpatterns:
+        if pattern.name in SKIP:
+            continue
+        kwargs = {
+            name: arguments[name]
+            for name in pattern.pattern.regex.groupindex
+        }
+        url = reverse(f'{urls.app_name}:{pattern.name}', kwargs=kwargs)
+        params = QUERY[pattern.name](post) if pattern.name in QUERY else {}
+        viewers = (ACCESS[pattern.name],) if pattern.name in ACCESS else PUBLIC
+        yield pattern.name, url, params, viewers
+
+
+def reader():
+    """Пользователь с самой большой лентой подписок."""
+    return User.objects.order_by('-counters__following_count').first()
+
+
+def _request(client, url, params):
+    # Запросы считаются по всем базам: чтение страниц уходит на реплики.
+    with ExitStack() as stack:
+        captured = [
+            stack.enter_context(CaptureQueriesContext(connections[alias]))
+            for alias in connections
+        ]
+        started = time.perf_counter()
+        response = client.get(url, params)
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+        elapsed = time.perf_counter() - started
+    queries = sum(len(queries) for queries in captured)
+    return elapsed * 1000, queries, size, response.status_code
+
+
+def measure(url, params, client, iterations, cold):
+    """Замеры одной страницы: cold — с очисткой кеша перед запросом."""
+    timings = []
+    query_counts = []
+    sizes = []
+    status = None
+    _request(client, url, params)
+    for _ in range(iterations):
+        if cold:
+            cache.clear()
+        elapsed, query_count, size, status = _request(client, url, params)
+        timings.append(elapsed)
+        query_counts.append(query_count)
+        sizes.append(size)
+    return {
+        'status': status,
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(_percentile(timings, 0.95), 2),
+        'queries': max(query_counts),
+        'bytes': max(sizes),
+    }
+
+
+def clients():
+    """Клиенты для каждого вида посетителя из ACCESS.
+
+    Если в базе нет персонала, клиента staff нет и его страницы
+    пропускаются.
+    """
+    host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else None
+    users = {
+        'anonymous': None,
+        'authenticated': reader(),
+        'author': heaviest_author(),
+        'staff': User.objects.filter(is_staff=True).first(),
+    }
+    result = {}
+    for name, user in users.items():
+        if user is None and name != 'anonymous':
+            continue
+        client = Client(SERVER_NAME=host or 'testserver')
+        if user is not None:
+            client.force_login(user)
+        result[name] = client
+    return result
+
+
+def run(iterations=20, progress=None):
+    """Прогоняет каждую страницу под теми, кто может её открыть,
+    с холодным и прогретым кешем. Возвращает словарь отчёта."""
+    available = clients()
+    results = {}
+    for name, url, params, viewers in targets():
+        for client_name in viewers:
+            client = available.get(client_name)
+            if client is None:
+                continue
+            for mode in ('cold', 'warm'):
+                key = f'{name} {client_name} {mode}'
+                results[key] = {
+                    'url': url,
+                    **measure(url, params, client, iterations, mode == 'cold'),
+                }
+                if progress:
+                    progress(key, results[key])
+    return {
+        'iterations': iterations,
+        'posts': Post.objects.count(),
+        'results': results,
+    }
+
+
+def compare(report, baseline, latency=0.25, queries=0, size=0.1):
+    """Список регрессий относительно baseline.
+
+    latency и size — допустимый относительный рост p95 и размера,
+    queries — допустимое число лишних запросов. Смена кода ответа —
+    тоже регрессия: остальные метрики тогда не сравниваются.
+    """
+    regressions = []
+    for key, result in report['results'].items():
+        before = baseline['results'].get(key)
+        if before is None:
+            continue
+        if result['status'] != before['status']:
+            regressions.append(
+                f'{key}: status {result["status"]} '
+                f'(было {before["status"]})'
+            )
+            continue
+        checks = [
+            ('p95_ms', before['p95_ms'] * (1 + latency)),
+            ('queries', before['queries'] + queries),
+            ('bytes', before['bytes'] * (1 + size)),
+        ]
+        for metric, limit in checks:
+            if result[metric] > limit:
+                regressions.append(
+                    f'{key}: {metric} {result[metric]} > {limit:g} '
+                    f'(было {before[metric]})'
+                )
+    return regressions
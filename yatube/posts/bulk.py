@@ -0,0 +1,153 @@
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, connections, router
+from django.db.models import Max
+from django.db.models.sql import InsertQuery
+from django.utils import timezone
+
+from . import cache, counters, follow_graph, timeline
+from .models import Comment, Group, Post, User
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def insert_keeping_created(model, objects, ignore_conflicts=False):
+    """Вставляет objects с их датами created; возвращает число
+    вставленных строк.
+
+    bulk_create пропустил бы поля через pre_save, и auto_now_add
+    затёр бы created временем вставки. Здесь, как в loaddata, значения
+    берутся из объектов как есть, поэтому пустые created и updated
+    заполняются заранее. id объектам без него назначает база; строки
+    с занятым id при ignore_conflicts пропускаются и в счёт не входят.
+    """
+    objects = list(objects)
+    now = timezone.now()
+    for obj in objects:
+        obj.created = obj.created or now
+        obj.updated = obj.updated or obj.created
+    meta = model._meta
+    connection = connections[router.db_for_write(model)]
+    inserted = 0
+    with connection.cursor() as cursor:
+        for with_pk in (True, False):
+            rows = [obj for obj in objects if (obj.pk is not None) == with_pk]
+            fields = [
+                field for field in meta.concrete_fields
+                if with_pk or field is not meta.auto_field
+            ]
+            size = max(connection.ops.bulk_batch_size(fields, rows), 1)
+            for start in range(0, len(rows), size):
+                query = InsertQuery(model, ignore_conflicts=ignore_conflicts)
+                query.insert_values(
+                    fields, rows[start:start + size], raw=True
+                )
+                compiler = query.get_compiler(connection=connection)
+                for sql, params in compiler.as_sql():
+                    cursor.execute(sql, params)
+                    inserted += cursor.rowcount
+    return inserted
+
+
+def drop_existing(model, objects, fields, chunk=500):
+    """objects без записей без id, уже лежащих в базе с теми же fields.
+
+    Так повтор пачки после сбоя не дублирует записи без id: узнать
+    их можно только по содержимому, и среди fields должна быть дата
+    created. Записи с id отсеет сама вставка.
+    """
+    fresh = [obj for obj in objects if obj.pk is None]
+    dates = sorted({obj.created for obj in fresh})
+    existing = set()
+    for start in range(0, len(dates), chunk):
+        existing.update(
+            model.objects
+            .filter(created__in=dates[start:start + chunk])
+            .values_list(*fields)
+        )
+    return [
+        obj for obj in objects
+        if obj.pk is not None
+        or tuple(getattr(obj, field) for field in fields) not in existing
+    ]
+
+
+class LookupMap:
+    """Кеш id по уникальному ключу (username, slug) для массовой вставки.
+
+    Промахи добирает одним запросом на пачку, а отсутствующие в базе
+    записи создаёт через bulk_create.
+    """
+
+    def __init__(self, model, field, defaults):
+        self.model = model
+        self.field = field
+        self.defaults = defaults
+        self.ids = {}
+
+    def _fetch(self, keys):
+        self.ids.update(
+            self.model.objects
+            .filter(**{f'{self.field}__in': keys})
+            .values_list(self.field, 'pk')
+        )
+
+    def resolve(self, keys):
+        """Заполняет карту для всех keys, создавая недостающие записи."""
+        missing = {key for key in keys if key and key not in self.ids}
+        if not missing:
+            return
+        self._fetch(missing)
+        missing -= self.ids.keys()
+        if missing:
+            self.model.objects.bulk_create(
+                [
+                    self.model(**{self.field: key}, **self.defaults(key))
+                    for key in missing
+                ],
+                ignore_conflicts=True,
+            )
+            self._fetch(missing)
+
+    def __getitem__(self, key):
+        return self.ids[key] if key else None
+
+
+def user_map():
+    return LookupMap(
+        User, 'username', lambda key: {'password': make_password(None)}
+    )
+
+
+def group_map():
+    return LookupMap(
+        Group, 'slug', lambda key: {'title': key, 'description': ''}
+    )
+
+
+def finish_import(author_ids, follower_ids=(), post_ids=(),
+                  batch_size=1000):
+    """Досчитывает то, что при обычном сохранении делают сигналы.
+
+    bulk_create сигналов не шлёт, поэтому после вставки нужно
+    сдвинуть последовательности id, пересчитать счётчики затронутых
+    пользователей и постов post_ids, разложить посты по лентам
+    подписчиков и сбросить кеш страниц и подписок follower_ids.
+    """
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [User, Group, Post, Comment]
+    )
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+    counters.recount(
+        batch_size=batch_size,
+        user_ids={*author_ids, *follower_ids},
+        post_ids=post_ids,
+    )
+    timeline.refresh_authors(author_ids)
+    follow_graph.invalidate(*follower_ids)
+    cache.bump('index', 'groups', 'users')
@@ -0,0 +1,132 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.views.decorators.http import condition
+
+from core.invalidation import now_and_on_commit
+from core.replicas import page_timeout
+
+
+def _generation_key(scope):
+    return f'posts:generation:{scope}'
+
+
+def _new_generation():
+    return int(time.time() * 1000)
+
+
+def get_generations(scopes):
+    """Текущие поколения областей кеша в порядке scopes.
+
+    Отсутствующие (новые или вытесненные) поколения заводятся
+    со значением от текущего времени, чтобы не совпасть со старыми.
+    """
+    keys = [_generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _new_generation(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def _increment(scopes):
+    for scope in scopes:
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_generation(), None)
+
+
+def bump(*scopes):
+    """Инвалидирует всё, что закешировано под областями scopes.
+
+    Поколение сдвигается сразу и после коммита (см. now_and_on_commit).
+    """
+    now_and_on_commit(_increment, scopes)
+
+
+def _page_timeout():
+    timeouts = [
+        timeout for timeout in (settings.PAGE_CACHE_TIMEOUT, page_timeout())
+        if timeout is not None
+    ]
+    return min(timeouts, default=None)
+
+
+def cache_page_by_generation(get_scopes):
+    """Кеширует страницу до смены поколения её областей.
+
+    Без общего кеша и для страниц, собранных по данным реплики,
+    срок хранения ограничен (см. _page_timeout).
+
+    get_scopes получает аргументы view и возвращает список областей.
+    Ключ учитывает пользователя и полный путь с параметрами.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            generations = get_generations(get_scopes(*args, **kwargs))
+            raw_key = '|'.join([
+                view.__name__,
+                str(request.user.pk),
+                request.get_full_path(),
+                *map(str, generations),
+            ])
+            key = 'posts:page:' + hashlib.md5(raw_key.encode()).hexdigest()
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(key, response, _page_timeout())
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_page(get_rows, get_scopes):
+    """Отвечает 304 на If-None-Match до запуска view.
+
+    get_rows получает запрос и аргументы view и возвращает пары
+    (ключ, updated) строк страницы. ETag строится из них, поколений
+    областей кеша страницы, адреса, пользователя и CSRF-токена: после
+    входа токен новый, и страница с формой не должна отдаваться
+    из кеша браузера со старым. Last-Modified
+    не отдаётся: дата строк не учитывает ни зрителя, ни подписки
+    со счётчиками, и одного If-Modified-Since хватило бы для
+    ошибочного 304.
+    """
+    def etag(request, *args, **kwargs):
+        rows = get_rows(request, *args, **kwargs)
+        raw_etag = '|'.join([
+            request.get_full_path(),
+            str(request.user.pk),
+            request.META.get('CSRF_COOKIE', ''),
+            *map(str, get_generations(get_scopes(*args, **kwargs))),
+            *(f'{pk}:{updated.isoformat()}' for pk, updated in rows),
+        ])
+        return hashlib.md5(raw_etag.encode()).hexdigest()
+
+    return condition(etag_func=etag)
+
+
+def detail_scopes(post_id):
+    return [f'post:{post_id}', 'groups', 'users']
+
+
+def index_scopes():
+    return ['index', 'groups', 'users']
+
+
+def group_scopes(slug):
+    return [f'group:{slug}', 'groups', 'users']
+
+
+def profile_scopes(username):
+    return [f'profile:{username}', 'groups', 'users']
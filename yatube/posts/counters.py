@@ -0,0 +1,112 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    ArchivedPost, Comment, Follow, Post, User, UserCounters
+)
+
+
+def change_user_counters(user_id, **deltas):
+    """Сдвигает счётчики пользователя на deltas одним UPDATE.
+
+    Строка счётчиков создаётся только для положительных сдвигов:
+    при каскадном удалении пользователя его счётчики удаляются раньше
+    постов и подписок, и уменьшать там уже нечего.
+    """
+    values = {field: F(field) + delta for field, delta in deltas.items()}
+    if UserCounters.objects.filter(user_id=user_id).update(**values):
+        return
+    if all(delta <= 0 for delta in deltas.values()):
+        return
+    UserCounters.objects.get_or_create(user_id=user_id)
+    UserCounters.objects.filter(user_id=user_id).update(**values)
+
+
+def change_comments_count(post_id, delta):
+    """Сдвигает счётчик комментариев и заодно дату изменения поста."""
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta,
+        updated=timezone.now(),
+    )
+
+
+def _count_subquery(queryset, field):
+    counted = (
+        queryset
+        .filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(
+        Subquery(counted, output_field=IntegerField()), 0
+    )
+
+
+def _batches(queryset, ids, batch_size):
+    """id строк queryset пачками по возрастанию; ids — только из них."""
+    if ids is not None:
+        ids = sorted(set(ids))
+        for start in range(0, len(ids), batch_size):
+            batch = list(
+                queryset
+                .filter(pk__in=ids[start:start + batch_size])
+                .order_by('pk')
+                .values_list('pk', flat=True)
+            )
+            if batch:
+                yield batch
+        return
+    last_id = 0
+    while True:
+        batch = list(
+            queryset
+            .filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+def recount(batch_size=1000, user_ids=None, post_ids=None):
+    """Пересчитывает счётчики по исходным таблицам.
+
+    По умолчанию — все; user_ids и post_ids ограничивают пересчёт
+    этими пользователями и постами. Работает пачками по id, чтобы
+    не держать долгих блокировок. Возвращает число обработанных
+    пользователей и постов.
+    """
+    users = posts = 0
+    for batch in _batches(User.objects, user_ids, batch_size):
+        UserCounters.objects.bulk_create(
+            [UserCounters(user_id=user_id) for user_id in batch],
+            ignore_conflicts=True,
+        )
+        (
+            UserCounters.objects
+            .filter(user_id__in=batch)
+            .update(
+                posts_count=(
+                    _count_subquery(Post.objects, 'author')
+                    + _count_subquery(ArchivedPost.objects, 'author')
+                ),
+                archived_posts_count=_count_subquery(
+                    ArchivedPost.objects, 'author'
+                ),
+                followers_count=_count_subquery(Follow.objects, 'author'),
+                following_count=_count_subquery(Follow.objects, 'user'),
+            )
+        )
+        users += len(batch)
+
+    for batch in _batches(Post.objects, post_ids, batch_size):
+        Post.objects.filter(pk__in=batch).update(
+            comments_count=_count_subquery(Comment.objects, 'post')
+        )
+        posts += len(batch)
+    return users, posts
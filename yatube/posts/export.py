@@ -0,0 +1,95 @@
+import csv
+import json
+
+from .models import ArchivedComment, ArchivedPost, Comment, Post
+
+FORMATS = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+# Колонки совпадают с форматом команды import_content.
+COLUMNS = ('type', 'id', 'author', 'group', 'text', 'created', 'image', 'post')
+
+POST_FIELDS = {
+    'id': 'id',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'text': 'text',
+    'created': 'created',
+    'image': 'image',
+}
+
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+
+
+def _record(kind, row, fields):
+    record = {'type': kind}
+    for name, lookup in fields.items():
+        value = row[lookup]
+        if name == 'created':
+            value = value.isoformat()
+        if value not in (None, ''):
+            record[name] = value
+    return record
+
+
+def _iter_tier(posts, comments, batch_size):
+    posts = posts.order_by('id').values(*POST_FIELDS.values())
+    last_id = 0
+    while True:
+        window = list(posts.filter(id__gt=last_id)[:batch_size])
+        if not window:
+            return
+        post_ids = [row['id'] for row in window]
+        for row in window:
+            yield _record('post', row, POST_FIELDS)
+        window_comments = (
+            comments
+            .filter(post_id__in=post_ids)
+            .order_by('post_id', 'id')
+            .values(*COMMENT_FIELDS.values())
+            .iterator(chunk_size=batch_size)
+        )
+        for row in window_comments:
+            yield _record('comment', row, COMMENT_FIELDS)
+        last_id = post_ids[-1]
+
+
+def iter_records(batch_size=1000, **lookups):
+    """Посты, подходящие под lookups, и комментарии к ним записями
+    import_content: сначала горячие, затем архивные.
+
+    Посты идут окнами по id (keyset), комментарии окна читаются
+    через iterator, поэтому в памяти не больше одного окна.
+    """
+    for posts, comments in (
+        (Post.objects, Comment.objects),
+        (ArchivedPost.objects, ArchivedComment.objects),
+    ):
+        yield from _iter_tier(posts.filter(**lookups), comments, batch_size)
+
+
+class _Echo:
+    """Файл для csv.writer, который просто возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def iter_lines(records, file_format):
+    """Строки выгрузки в формате jsonl или csv."""
+    if file_format == 'jsonl':
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+        return
+    writer = csv.DictWriter(_Echo(), fieldnames=COLUMNS)
+    yield writer.writeheader()
+    for record in records:
+        yield writer.writerow(record)
@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.invalidation import now_and_on_commit
+
+from .models import Follow, User
+
+
+def _following_key(user_id):
+    return f'posts:following:{user_id}'
+
+
+def following_ids(user_id):
+    """Множество id авторов, на которых подписан пользователь.
+
+    Читается из кеша; при промахе — одним запросом по id, без
+    загрузки самих Follow и пользователей.
+    """
+    key = _following_key(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(
+            Follow.objects
+            .filter(user_id=user_id)
+            .values_list('author_id', flat=True)
+        )
+        cache.set(key, ids, settings.FOLLOW_CACHE_TTL)
+    return ids
+
+
+def is_following(user, author):
+    if not user.is_authenticated or user.pk == author.pk:
+        return False
+    return author.pk in following_ids(user.pk)
+
+
+def invalidate(*user_ids):
+    """Сбрасывает закешированные подписки пользователей
+    (см. now_and_on_commit)."""
+    keys = [_following_key(user_id) for user_id in user_ids]
+    now_and_on_commit(cache.delete_many, keys)
+
+
+def follow(user, author):
+    """Подписывает user на author; повторная подписка ничего не делает.
+
+    Возвращает True, если подписка появилась.
+    """
+    if user.pk == author.pk:
+        return False
+    with transaction.atomic():
+        _, created = Follow.objects.get_or_create(user=user, author=author)
+    return created
+
+
+def unfollow(user, author):
+    """Отписывает user от author. Возвращает True, если было от чего."""
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(user=user, author=author).delete()
+    return bool(deleted)
+
+
+class FollowPage:
+    """Страница списка подписок: пользователи и id для следующей."""
+
+    def __init__(self, users, next_after):
+        self.object_list = users
+        self.next_after = next_after
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_after is not None
+
+
+def _page(follows, field, after, per_page):
+    if after is not None:
+        follows = follows.filter(id__lt=after)
+    rows = list(
+        follows.order_by('-id').values_list('id', field)[:per_page + 1]
+    )
+    next_after = rows[per_page - 1][0] if len(rows) > per_page else None
+    rows = rows[:per_page]
+    users = User.objects.select_related('counters').in_bulk(
+        [user_id for _, user_id in rows]
+    )
+    return FollowPage(
+        [users[user_id] for _, user_id in rows if user_id in users],
+        next_after,
+    )
+
+
+def followers(author, after=None, per_page=None):
+    """Подписчики автора, новые первыми, keyset-страницей по id Follow."""
+    return _page(
+        Follow.objects.filter(author=author), 'user_id', after,
+        per_page or settings.POSTS_IN_PAGE,
+    )
+
+
+def following(user, after=None, per_page=None):
+    """Авторы, на которых подписан пользователь, новые первыми."""
+    return _page(
+        Follow.objects.filter(user=user), 'author_id', after,
+        per_page or settings.POSTS_IN_PAGE,
+    )
@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts.archive import archive_older_than
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит посты старше заданного срока вместе с комментариями '
+        'в архивные таблицы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            required=True,
+            help='Возраст поста в днях, после которого он уходит в архив',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько постов переносить за одну транзакцию',
+        )
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 1:
+            raise CommandError('--older-than должен быть не меньше 1')
+        cutoff = timezone.now() - timedelta(days=options['older_than'])
+
+        def progress(posts, comments):
+            self.stdout.write(
+                f'Перенесено постов: {posts}, комментариев: {comments}'
+            )
+
+        posts, comments = archive_older_than(
+            cutoff, options['batch_size'], progress
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'В архиве {posts} постов и {comments} комментариев'
+        ))
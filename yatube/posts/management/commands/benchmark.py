@@ -0,0 +1,92 @@
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет p50/p95, число SQL-запросов и размер ответа всех '
+        'страниц posts и сравнивает с сохранённым baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--generate',
+            type=int,
+            metavar='POSTS',
+            help='Сначала создать набор данных из стольких постов '
+                 '(см. generate_data)',
+        )
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument(
+            '--output', help='Куда записать отчёт в JSON'
+        )
+        parser.add_argument(
+            '--baseline', help='Отчёт, с которым сравнивать'
+        )
+        parser.add_argument(
+            '--latency-threshold',
+            type=float,
+            default=0.25,
+            help='Допустимый рост p95, доля (0.25 — на 25%%)',
+        )
+        parser.add_argument(
+            '--query-threshold',
+            type=int,
+            default=0,
+            help='Допустимое число лишних запросов',
+        )
+        parser.add_argument(
+            '--bytes-threshold',
+            type=float,
+            default=0.1,
+            help='Допустимый рост размера ответа, доля',
+        )
+
+    def handle(self, *args, **options):
+        if options['generate']:
+            posts = options['generate']
+            call_command(
+                'generate_data',
+                users=max(posts // 100, 2),
+                groups=max(posts // 5000, 1),
+                posts=posts,
+                comments=posts * 2,
+                follows=max(posts // 20, 1),
+                stdout=self.stdout,
+            )
+        try:
+            report = benchmark.run(
+                iterations=options['iterations'], progress=self.progress
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(report, stream, ensure_ascii=False, indent=2)
+        if not options['baseline']:
+            return
+        with open(options['baseline'], encoding='utf-8') as stream:
+            baseline = json.load(stream)
+        regressions = benchmark.compare(
+            report,
+            baseline,
+            latency=options['latency_threshold'],
+            queries=options['query_threshold'],
+            size=options['bytes_threshold'],
+        )
+        if regressions:
+            raise CommandError(
+                'Регрессии относительно baseline:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def progress(self, key, result):
+        self.stdout.write(
+            f'{key:<45} {result["status"]} '
+            f'p50 {result["p50_ms"]:>8} мс  p95 {result["p95_ms"]:>8} мс  '
+            f'{result["queries"]:>3} запросов  {result["bytes"]:>7} байт'
+        )
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import FORMATS, iter_lines, iter_records
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты группы или автора, включая архивные, с комментариями '
+        'в JSONL или CSV, не загружая их в память целиком'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', help='slug группы')
+        parser.add_argument('--author', help='username автора')
+        parser.add_argument(
+            '--format', choices=tuple(FORMATS), default='jsonl'
+        )
+        parser.add_argument(
+            '--output', help='Файл выгрузки (по умолчанию stdout)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько постов читать за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        lookups = {}
+        if options['group']:
+            group = Group.objects.filter(slug=options['group']).first()
+            if group is None:
+                raise CommandError(f'Нет группы {options["group"]}')
+            lookups['group'] = group
+        if options['author']:
+            author = User.objects.filter(username=options['author']).first()
+            if author is None:
+                raise CommandError(f'Нет автора {options["author"]}')
+            lookups['author'] = author
+        lines = iter_lines(
+            iter_records(batch_size=options['batch_size'], **lookups),
+            options['format'],
+        )
+        if options['output']:
+            with open(
+                options['output'], 'w', newline='', encoding='utf-8'
+            ) as stream:
+                stream.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
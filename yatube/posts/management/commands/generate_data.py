@@ -0,0 +1,229 @@
+import io
+import itertools
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from posts import bulk
+from posts.models import Comment, Follow, Group, Post, User
+
+# Сколько разных предложений и имён заготовить: Faker медленный,
+# а для нагрузки важен объём, а не уникальность каждого текста.
+POOL_SIZE = 2000
+
+
+def power_law(count, alpha, rng):
+    """Функция, выбирающая индекс из range(count) по степенному закону:
+    индекс 0 самый популярный, плотность у индекса i ~ (i + 1) ** -alpha.
+
+    Выборка через обратную функцию распределения, без таблицы весов,
+    поэтому память не зависит от count.
+    """
+    if alpha == 1:
+        def sample():
+            return (count + 1) ** rng.random()
+    else:
+        top = (count + 1) ** (1 - alpha)
+
+        def sample():
+            return ((top - 1) * rng.random() + 1) ** (1 / (1 - alpha))
+    return lambda: min(int(sample()) - 1, count - 1)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу воспроизводимым набором данных для нагрузочных '
+        'тестов: авторы постов и подписок распределены по степенному закону'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=5000)
+        parser.add_argument(
+            '--images',
+            type=float,
+            default=0,
+            help='Доля постов с картинкой, от 0 до 1',
+        )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=1.1,
+            help='Показатель степенного закона популярности',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='За сколько последних дней распределить посты',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['users'] < 2:
+            raise CommandError('Нужно хотя бы два пользователя')
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.alpha = options['alpha']
+        self.sentences = [self.fake.sentence() for _ in range(POOL_SIZE)]
+        self.started = time.monotonic()
+
+        user_ids = self.create_users(options['users'])
+        group_ids = self.create_groups(options['groups'])
+        self.start = timezone.now() - timedelta(days=options['days'])
+        self.step = timedelta(days=options['days']) / max(options['posts'], 1)
+        post_ids = self.create_posts(
+            options['posts'], user_ids, group_ids, options['images']
+        )
+        self.create_comments(options['comments'], user_ids, post_ids)
+        self.create_follows(options['follows'], user_ids)
+
+        self.stdout.write('Пересчёт счётчиков и лент подписок…')
+        bulk.finish_import(
+            user_ids, post_ids=post_ids, batch_size=self.batch_size
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - self.started:.1f} с'
+        ))
+
+    def insert(self, model, objects, total):
+        """Вставляет объекты генератора пачками по batch_size."""
+        done = 0
+        started = time.monotonic()
+        objects = iter(objects)
+        while True:
+            batch = list(itertools.islice(objects, self.batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                if model in (Post, Comment):
+                    bulk.insert_keeping_created(
+                        model, batch, ignore_conflicts=True
+                    )
+                else:
+                    model.objects.bulk_create(batch, ignore_conflicts=True)
+            done += len(batch)
+            rate = done / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {done}/{total}, '
+                f'{rate:.0f} в секунду'
+            )
+
+    def create_users(self, count):
+        first = bulk.next_id(User)
+        password = make_password(None)
+        names = [
+            (self.fake.first_name(), self.fake.last_name())
+            for _ in range(min(count, POOL_SIZE))
+        ]
+        self.insert(User, (
+            User(
+                id=first + i,
+                username=f'user_{first + i}',
+                first_name=first_name,
+                last_name=last_name,
+                password=password,
+            )
+            for i, (first_name, last_name) in zip(
+                range(count), itertools.cycle(names)
+            )
+        ), count)
+        return range(first, first + count)
+
+    def create_groups(self, count):
+        first = bulk.next_id(Group)
+        self.insert(Group, (
+            Group(
+                id=first + i,
+                slug=f'group-{first + i}',
+                title=self.fake.catch_phrase()[:200],
+                description=self.fake.paragraph(),
+            )
+            for i in range(count)
+        ), count)
+        return range(first, first + count)
+
+    def create_images(self, variants=10):
+        """Сохраняет несколько картинок, которые делят между собой посты."""
+        names = []
+        for i in range(variants):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            content = io.BytesIO()
+            Image.new('RGB', (960, 540), color).save(content, 'JPEG')
+            names.append(default_storage.save(
+                f'posts/generated_{i}.jpg', ContentFile(content.getvalue())
+            ))
+        return names
+
+    def create_posts(self, count, user_ids, group_ids, share):
+        first = bulk.next_id(Post)
+        author = power_law(len(user_ids), self.alpha, self.rng)
+        group = power_law(len(group_ids), self.alpha, self.rng)
+        names = self.create_images() if share > 0 else []
+
+        def posts():
+            for i in range(count):
+                image = ''
+                if names and self.rng.random() < share:
+                    image = self.rng.choice(names)
+                yield Post(
+                    id=first + i,
+                    author_id=user_ids[author()],
+                    group_id=(
+                        group_ids[group()]
+                        if group_ids and self.rng.random() < 0.7 else None
+                    ),
+                    text=' '.join(self.rng.sample(self.sentences, 3)),
+                    image=image,
+                    created=self.start + self.step * i,
+                )
+        self.insert(Post, posts(), count)
+        return range(first, first + count)
+
+    def create_comments(self, count, user_ids, post_ids):
+        if not post_ids:
+            return
+        # Свежие посты комментируют чаще: популярны последние id.
+        post = power_law(len(post_ids), self.alpha, self.rng)
+        now = timezone.now()
+
+        def comments():
+            for _ in range(count):
+                index = len(post_ids) - 1 - post()
+                yield Comment(
+                    post_id=post_ids[index],
+                    author_id=self.rng.choice(user_ids),
+                    text=self.rng.choice(self.sentences),
+                    created=min(
+                        self.start + self.step * index
+                        + timedelta(minutes=self.rng.randrange(1, 600)),
+                        now,
+                    ),
+                )
+        self.insert(Comment, comments(), count)
+
+    def create_follows(self, count, user_ids):
+        author = power_law(len(user_ids), self.alpha, self.rng)
+
+        def follows():
+            for _ in range(count):
+                user_id = self.rng.choice(user_ids)
+                author_id = user_ids[author()]
+                if user_id != author_id:
+                    yield Follow(user_id=user_id, author_id=author_id)
+        self.insert(Follow, follows(), count)
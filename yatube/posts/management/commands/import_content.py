@@ -0,0 +1,261 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import bulk
+from posts.models import Comment, Follow, Post
+
+KINDS = ('post', 'comment', 'follow')
+
+
+def read_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def read_csv(stream):
+    for row in csv.DictReader(stream):
+        yield {key: value for key, value in row.items() if value != ''}
+
+
+def parse_id(value):
+    return int(value) if value else None
+
+
+def parse_created(value):
+    if not value:
+        return timezone.now()
+    created = parse_datetime(value)
+    if created is None:
+        raise ValueError(f'Неверная дата: {value}')
+    if timezone.is_naive(created):
+        created = timezone.make_aware(created, timezone.utc)
+    return created
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты, комментарии и подписки из JSONL или CSV. '
+        'Каждая запись — объект с полем type: post, comment или follow.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .jsonl или .csv')
+        parser.add_argument(
+            '--format',
+            choices=('jsonl', 'csv'),
+            help='Формат файла, если его не видно по расширению',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько записей вставлять в одной транзакции',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с числом уже импортированных записей '
+                 '(по умолчанию <path>.checkpoint)',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать с начала файла, не глядя на checkpoint',
+        )
+        parser.add_argument(
+            '--images',
+            help='Каталог, относительно которого берутся картинки постов',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(path)[1][1:]
+        if file_format not in ('jsonl', 'csv'):
+            raise CommandError('Укажите --format jsonl или --format csv')
+        self.batch_size = options['batch_size']
+        self.images = options['images']
+        self.checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        # Рядом с checkpoint копятся id, задетые уже записанными пачками:
+        # после возобновления их тоже нужно пересчитать.
+        self.touched = f'{self.checkpoint}.touched'
+        if options['restart']:
+            self.remove_progress()
+        done = self.read_checkpoint()
+        self.users = bulk.user_map()
+        self.groups = bulk.group_map()
+        self.skipped = 0
+
+        reader = read_jsonl if file_format == 'jsonl' else read_csv
+        started = time.monotonic()
+        imported = 0
+        with open(path, newline='', encoding='utf-8') as stream:
+            records = islice(reader(stream), done, None)
+            while True:
+                batch = list(islice(records, self.batch_size))
+                if not batch:
+                    break
+                try:
+                    touched = self.import_batch(batch)
+                except (KeyError, ValueError) as error:
+                    raise CommandError(
+                        f'Запись {done + 1}–{done + len(batch)}: {error!r}'
+                    )
+                done += len(batch)
+                imported += len(batch)
+                self.write_touched(touched)
+                self.write_checkpoint(done)
+                rate = imported / max(time.monotonic() - started, 1e-6)
+                self.stdout.write(
+                    f'Импортировано {done} записей, {rate:.0f} в секунду'
+                )
+
+        bulk.finish_import(*self.read_touched(), batch_size=self.batch_size)
+        self.remove_progress()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {imported} записей, пропущено {self.skipped}'
+        ))
+
+    def read_checkpoint(self):
+        try:
+            with open(self.checkpoint) as stream:
+                return int(stream.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def write_checkpoint(self, done):
+        # Через временный файл, чтобы сбой не оставил его пустым.
+        temporary = f'{self.checkpoint}.tmp'
+        with open(temporary, 'w') as stream:
+            stream.write(str(done))
+        os.replace(temporary, self.checkpoint)
+
+    def remove_progress(self):
+        for name in (self.checkpoint, self.touched):
+            if os.path.exists(name):
+                os.remove(name)
+
+    def write_touched(self, touched):
+        # Дописывается до checkpoint: при сбое между ними лишние id
+        # только пересчитаются ещё раз.
+        authors, followers, posts = touched
+        with open(self.touched, 'a') as stream:
+            stream.write(json.dumps({
+                'authors': sorted(authors),
+                'followers': sorted(followers),
+                'posts': sorted(posts),
+            }) + '\n')
+
+    def read_touched(self):
+        """id авторов, подписчиков и постов из всех записанных пачек."""
+        authors, followers, posts = set(), set(), set()
+        try:
+            with open(self.touched) as stream:
+                for line in stream:
+                    touched = json.loads(line)
+                    authors.update(touched['authors'])
+                    followers.update(touched['followers'])
+                    posts.update(touched['posts'])
+        except FileNotFoundError:
+            pass
+        return authors, followers, posts
+
+    def import_batch(self, batch):
+        """Записывает пачку в одной транзакции и возвращает множества
+        задетых ею id авторов, подписчиков и постов."""
+        by_kind = {kind: [] for kind in KINDS}
+        for record in batch:
+            kind = record.get('type')
+            if kind not in by_kind:
+                raise ValueError(f'Неизвестный тип записи: {kind}')
+            by_kind[kind].append(record)
+
+        self.users.resolve(
+            {record['author'] for record in batch}
+            | {record['user'] for record in by_kind['follow']}
+        )
+        self.groups.resolve(
+            {record.get('group') for record in by_kind['post']}
+        )
+        post_ids = {int(record['post']) for record in by_kind['comment']}
+        known_posts = set(
+            Post.objects.filter(pk__in=post_ids)
+            .values_list('pk', flat=True)
+        )
+        posts = [self.build_post(record) for record in by_kind['post']]
+        known_posts.update(post.pk for post in posts)
+        comments = []
+        for record in by_kind['comment']:
+            if int(record['post']) in known_posts:
+                comments.append(self.build_comment(record))
+            else:
+                self.skipped += 1
+        follows = [
+            Follow(
+                user_id=self.users[record['user']],
+                author_id=self.users[record['author']],
+            )
+            for record in by_kind['follow']
+            if record['user'] != record['author']
+        ]
+        self.skipped += len(by_kind['follow']) - len(follows)
+        # id считаются по всей пачке: при повторе после сбоя между
+        # коммитом и записью .touched уже записанные тоже нужно учесть.
+        touched = (
+            {post.author_id for post in posts}
+            | {follow.author_id for follow in follows},
+            {follow.user_id for follow in follows},
+            {comment.post_id for comment in comments},
+        )
+        built = len(posts) + len(comments)
+        posts = bulk.drop_existing(
+            Post, posts, ('author_id', 'created', 'text')
+        )
+        comments = bulk.drop_existing(
+            Comment, comments, ('post_id', 'author_id', 'created', 'text')
+        )
+
+        # Повтор пачки после сбоя безопасен: записи с заданными id,
+        # уже записанные записи без id и подписки пропускаются.
+        with transaction.atomic():
+            inserted = bulk.insert_keeping_created(
+                Post, posts, ignore_conflicts=True
+            )
+            inserted += bulk.insert_keeping_created(
+                Comment, comments, ignore_conflicts=True
+            )
+            Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        self.skipped += built - inserted
+        return touched
+
+    def build_post(self, record):
+        post = Post(
+            id=parse_id(record.get('id')),
+            author_id=self.users[record['author']],
+            group_id=self.groups[record.get('group')],
+            text=record['text'],
+            created=parse_created(record.get('created')),
+        )
+        if self.images and record.get('image'):
+            name = record['image']
+            with open(os.path.join(self.images, name), 'rb') as image:
+                post.image.save(os.path.basename(name), File(image), False)
+        return post
+
+    def build_comment(self, record):
+        return Comment(
+            id=parse_id(record.get('id')),
+            post_id=int(record['post']),
+            author_id=self.users[record['author']],
+            text=record['text'],
+            created=parse_created(record.get('created')),
+        )
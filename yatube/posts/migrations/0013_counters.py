@@ -0,0 +1,67 @@
+# Generated by Django 2.2.16 on 2026-10-18 16:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+
+    def totals(queryset, field):
+        return dict(
+            queryset.order_by().values_list(field).annotate(models.Count('id'))
+        )
+
+    posts = totals(Post.objects, 'author_id')
+    followers = totals(Follow.objects, 'author_id')
+    following = totals(Follow.objects, 'user_id')
+    UserCounters.objects.bulk_create(
+        [
+            UserCounters(
+                user_id=user_id,
+                posts_count=posts.get(user_id, 0),
+                followers_count=followers.get(user_id, 0),
+                following_count=following.get(user_id, 0),
+            )
+            for user_id in User.objects.values_list('id', flat=True)
+        ],
+        batch_size=500,
+    )
+    for post_id, total in totals(
+        apps.get_model('posts', 'Comment').objects, 'post_id'
+    ).items():
+        Post.objects.filter(id=post_id).update(comments_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0012_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(help_text='Владелец счётчиков', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.IntegerField(default=0, help_text='Число постов пользователя', verbose_name='Постов')),
+                ('followers_count', models.IntegerField(default=0, help_text='Число подписчиков пользователя', verbose_name='Подписчиков')),
+                ('following_count', models.IntegerField(default=0, help_text='Число авторов, на которых подписан пользователь', verbose_name='Подписок')),
+            ],
+            options={
+                'verbose_name': 'user counters',
+                'verbose_name_plural': 'user counters',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.IntegerField(default=0, help_text='Счётчик комментариев к посту', verbose_name='Комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
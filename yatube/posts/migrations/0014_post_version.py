@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='version',
+            field=models.PositiveIntegerField(default=1, help_text='Растёт при изменении того, что видно в карточке поста', verbose_name='Версия'),
+        ),
+    ]
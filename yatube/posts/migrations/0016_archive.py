@@ -0,0 +1,69 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0015_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercounters',
+            name='archived_posts_count',
+            field=models.IntegerField(default=0, help_text='Сколько постов пользователя перенесено в архив', verbose_name='Архивных постов'),
+        ),
+        migrations.AlterField(
+            model_name='usercounters',
+            name='posts_count',
+            field=models.IntegerField(default=0, help_text='Число постов пользователя, включая архивные', verbose_name='Постов'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedPost',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(verbose_name='Дата создания')),
+                ('updated', models.DateTimeField(verbose_name='Дата изменения')),
+                ('text', models.TextField(verbose_name='Пост')),
+                ('image', models.ImageField(blank=True, upload_to='posts/', verbose_name='Картинка')),
+                ('comments_count', models.IntegerField(default=0, verbose_name='Комментариев')),
+                ('version', models.PositiveIntegerField(default=1, verbose_name='Версия')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_posts', to=settings.AUTH_USER_MODEL, verbose_name='Автор поста')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_posts', to='posts.Group', verbose_name='Группа')),
+            ],
+            options={
+                'verbose_name': 'archived post',
+                'verbose_name_plural': 'archived posts',
+                'ordering': ['-created', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(verbose_name='Дата создания')),
+                ('updated', models.DateTimeField(verbose_name='Дата изменения')),
+                ('text', models.TextField(verbose_name='Комментарий')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_comments', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='posts.ArchivedPost', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'archived comment',
+                'verbose_name_plural': 'archived comments',
+                'ordering': ['-created', '-id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedpost',
+            index=models.Index(fields=['author', '-created', '-id'], name='archived_post_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcomment',
+            index=models.Index(fields=['post', '-created', '-id'], name='archived_comment_post_idx'),
+        ),
+    ]
@@ -1,7 +1,6 @@
-from tkinter import CASCADE
 from django.db import models
 from django.contrib.auth import get_user_model
-from core.models import CreatedModel
+from core.models import UpdatedModel
 
 User = get_user_model()
 
@@ -30,7 +29,9 @@ class Group(models.Model):
         verbose_name_plural = 'Groups'
 
 
-class Post(CreatedModel):
+class Post(UpdatedModel):
+    is_archived = False
+
     text = models.TextField(
         verbose_name="Пост",
         help_text='Текст нового поста'
@@ -56,20 +57,41 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.IntegerField(
+        default=0,
+        verbose_name="Комментариев",
+        help_text='Счётчик комментариев к посту'
+    )
+    version = models.PositiveIntegerField(
+        default=1,
+        verbose_name="Версия",
+        help_text='Растёт при изменении того, что видно в карточке поста'
+    )
 
     def __str__(self):
         return self.text[:15]
 
     class Meta:
-        ordering = ['-created']
+        ordering = ['-created', '-id']
         verbose_name = 'Post'
         verbose_name_plural = 'Posts'
+        indexes = [
+            models.Index(fields=['-created', '-id'], name='post_created_idx'),
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='post_author_created_idx'
+            ),
+            models.Index(
+                fields=['group', '-created', '-id'],
+                name='post_group_created_idx'
+            ),
+        ]
 
 
-class Comment(CreatedModel):
+class Comment(UpdatedModel):
     post = models.ForeignKey(
         Post,
-        on_delete=CASCADE,
+        on_delete=models.CASCADE,
         blank=True,
         null=True,
         related_name='comments',
@@ -78,7 +100,7 @@ class Comment(CreatedModel):
     )
     author = models.ForeignKey(
         User,
-        on_delete=CASCADE,
+        on_delete=models.CASCADE,
         related_name='comments',
         verbose_name="Автор поста",
         help_text='Автор'
@@ -92,22 +114,28 @@ class Comment(CreatedModel):
         return "Комментарий"
 
     class Meta:
-        ordering = ['-created']
+        ordering = ['-created', '-id']
         verbose_name = 'Comment'
         verbose_name_plural = 'Comments'
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'
+            ),
+        ]
 
 
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
-        on_delete=CASCADE,
+        on_delete=models.CASCADE,
         related_name='follower',
         verbose_name="Подписчик",
         help_text='тот кто подписывается '
     )
     author = models.ForeignKey(
         User,
-        on_delete=CASCADE,
+        on_delete=models.CASCADE,
         related_name='following',
         verbose_name="Блогер",
         help_text='тот на кого подписываются'
@@ -119,3 +147,178 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'follow'
         verbose_name_plural = 'follows'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow'
+            ),
+        ]
+
+
+class UserCounters(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name="Пользователь",
+        help_text='Владелец счётчиков'
+    )
+    posts_count = models.IntegerField(
+        default=0,
+        verbose_name="Постов",
+        help_text='Число постов пользователя, включая архивные'
+    )
+    archived_posts_count = models.IntegerField(
+        default=0,
+        verbose_name="Архивных постов",
+        help_text='Сколько постов пользователя перенесено в архив'
+    )
+    followers_count = models.IntegerField(
+        default=0,
+        verbose_name="Подписчиков",
+        help_text='Число подписчиков пользователя'
+    )
+    following_count = models.IntegerField(
+        default=0,
+        verbose_name="Подписок",
+        help_text='Число авторов, на которых подписан пользователь'
+    )
+
+    def __str__(self):
+        return 'Счётчики'
+
+    class Meta:
+        verbose_name = 'user counters'
+        verbose_name_plural = 'user counters'
+
+
+class ArchivedPost(models.Model):
+    """Старый пост, перенесённый из горячей таблицы командой archive_posts.
+
+    Те же поля и тот же id, что у Post: страницы поста и профиля
+    показывают его так же, но без правки и новых комментариев.
+    """
+    is_archived = True
+
+    id = models.IntegerField(primary_key=True)
+    created = models.DateTimeField(verbose_name="Дата создания")
+    updated = models.DateTimeField(verbose_name="Дата изменения")
+    text = models.TextField(verbose_name="Пост")
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_posts',
+        verbose_name="Автор поста",
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='archived_posts',
+        verbose_name="Группа",
+    )
+    image = models.ImageField('Картинка', upload_to='posts/', blank=True)
+    comments_count = models.IntegerField(
+        default=0, verbose_name="Комментариев"
+    )
+    version = models.PositiveIntegerField(default=1, verbose_name="Версия")
+
+    def __str__(self):
+        return self.text[:15]
+
+    class Meta:
+        ordering = ['-created', '-id']
+        verbose_name = 'archived post'
+        verbose_name_plural = 'archived posts'
+        indexes = [
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='archived_post_author_idx'
+            ),
+        ]
+
+
+class ArchivedComment(models.Model):
+    """Комментарий архивного поста."""
+    id = models.IntegerField(primary_key=True)
+    created = models.DateTimeField(verbose_name="Дата создания")
+    updated = models.DateTimeField(verbose_name="Дата изменения")
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='comments',
+        verbose_name="Пост",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_comments',
+        verbose_name="Автор",
+    )
+    text = models.TextField(verbose_name="Комментарий")
+
+    def __str__(self):
+        return "Комментарий"
+
+    class Meta:
+        ordering = ['-created', '-id']
+        verbose_name = 'archived comment'
+        verbose_name_plural = 'archived comments'
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='archived_comment_post_idx'
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: пост автора у подписчика."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name="Подписчик",
+        help_text='Владелец ленты'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name="Пост",
+        help_text='Пост в ленте'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Автор поста",
+        help_text='Автор'
+    )
+    created = models.DateTimeField(
+        verbose_name="Дата создания поста",
+        help_text='Дата'
+    )
+
+    def __str__(self):
+        return 'Запись ленты'
+
+    class Meta:
+        ordering = ['-created', '-post_id']
+        verbose_name = 'timeline entry'
+        verbose_name_plural = 'timeline entries'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created', '-post'],
+                name='timeline_user_created_idx'
+            ),
+        ]
@@ -1,10 +1,186 @@
+import base64
+import binascii
+import math
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.paginator import Page, Paginator
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+
+from .archive import TieredPosts
+
+
+def encode_cursor(obj):
+    """Непрозрачный токен позиции записи в ленте по (created, id)."""
+    raw = f'{obj.created.isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (created, id) из токена или None, если токен битый."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        created = parse_datetime(created)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return None
+    if created is None:
+        return None
+    return created, pk
+
+
+class CursorPage(Page):
+    """Страница keyset-пагинации: знает только соседей, а не номер."""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<CursorPage of %s>' % len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.object_list[0])
+        return None
 
 
-def paginator(post_list, request):
+class CursorPaginator(Paginator):
+    """Пагинация по (created, id) без COUNT(*) и OFFSET.
+
+    Стоимость страницы не зависит от глубины: каждый запрос —
+    это диапазон по индексу с LIMIT per_page + 1.
+    """
+
+    def __init__(self, object_list, per_page, fields=('created', 'id')):
+        super().__init__(object_list, per_page)
+        self.fields = fields
+
+    def _tiers(self):
+        # TieredPosts листается по частям: каждая следующая целиком
+        # старше предыдущей, так что курсор просто переходит в неё.
+        if isinstance(self.object_list, TieredPosts):
+            return self.object_list.tiers
+        return [self.object_list]
+
+    def _seek(self, queryset, cursor, lookup):
+        created, pk = cursor
+        date_field, id_field = self.fields
+        return queryset.filter(
+            Q(**{f'{date_field}__{lookup}': created})
+            | Q(**{date_field: created, f'{id_field}__{lookup}': pk})
+        )
+
+    def _rows(self, tiers, cursor, lookup, ordering, limit):
+        rows = []
+        for queryset in tiers:
+            if cursor is not None:
+                queryset = self._seek(queryset, cursor, lookup)
+            rows.extend(queryset.order_by(*ordering)[:limit - len(rows)])
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def get_cursor_page(self, after=None, before=None):
+        per_page = self.per_page
+        date_field, id_field = self.fields
+        tiers = self._tiers()
+        if before is not None:
+            rows = self._rows(
+                tiers[::-1], before, 'gt', (date_field, id_field),
+                per_page + 1,
+            )
+            if rows:
+                has_previous = len(rows) > per_page
+                rows = rows[:per_page][::-1]
+                return CursorPage(rows, self, True, has_previous)
+            after = None
+        rows = self._rows(
+            tiers, after, 'lt', (f'-{date_field}', f'-{id_field}'),
+            per_page + 1,
+        )
+        has_next = len(rows) > per_page
+        return CursorPage(rows[:per_page], self, has_next, after is not None)
+
+
+def paginator(post_list, request, cursor_fields=('created', 'id')):
+    """Страница ленты: нумерованная или keyset (см. POSTS_PAGINATION).
+
+    cursor_fields — поля даты и id поста в post_list, по которым
+    строится курсор (для ленты подписок это ('created', 'post_id')).
+    """
+    after = decode_cursor(request.GET.get('after'))
+    before = decode_cursor(request.GET.get('before'))
+    cursor_mode = (
+        settings.POSTS_PAGINATION == 'cursor'
+        or after is not None
+        or before is not None
+    )
+    # Keyset-пагинация нужна queryset (или их цепочка TieredPosts);
+    # прочие списки (выдача поиска) листаются по номерам страниц.
+    if cursor_mode and isinstance(post_list, (QuerySet, TieredPosts)):
+        cursor_paginator = CursorPaginator(
+            post_list, settings.POSTS_IN_PAGE, cursor_fields
+        )
+        return cursor_paginator.get_cursor_page(after=after, before=before)
+
     paginator = Paginator(post_list, settings.POSTS_IN_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
     return page_obj
+
+
+def page_rows(post_list, request, cursor_fields=('created', 'id')):
+    """(id, updated) постов страницы, которую покажет paginator.
+
+    Та же выборка, но только двух колонок, без объектов и без COUNT(*)
+    — для дешёвых валидаторов условного GET. Номер страницы
+    за пределами ленты, как и Paginator.get_page, даёт последнюю
+    страницу; только тогда строки считаются COUNT(*).
+    """
+    post_list = post_list.values_list('id', 'updated')
+    after = decode_cursor(request.GET.get('after'))
+    before = decode_cursor(request.GET.get('before'))
+    if (
+        settings.POSTS_PAGINATION == 'cursor'
+        or after is not None
+        or before is not None
+    ):
+        cursor_paginator = CursorPaginator(
+            post_list, settings.POSTS_IN_PAGE, cursor_fields
+        )
+        return list(
+            cursor_paginator.get_cursor_page(after=after, before=before)
+        )
+    per_page = settings.POSTS_IN_PAGE
+    try:
+        number = int(request.GET.get('page', 1))
+    except (TypeError, ValueError):
+        number = 1
+    if number >= 1:
+        start = (number - 1) * per_page
+        rows = list(post_list[start:start + per_page])
+        if rows or number == 1:
+            return rows
+    last = max(math.ceil(post_list.count() / per_page), 1)
+    start = (last - 1) * per_page
+    return list(post_list[start:start + per_page])
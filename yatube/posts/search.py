@@ -0,0 +1,163 @@
+import re
+
+from django.db import connections
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+
+INSTALL_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text,
+        content='posts_post',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+]
+
+TRIGGERS = {
+    f'{FTS_TABLE}_insert',
+    f'{FTS_TABLE}_delete',
+    f'{FTS_TABLE}_update',
+}
+
+
+def is_supported(connection):
+    return connection.vendor == 'sqlite'
+
+
+def install_index(using='default', **kwargs):
+    """Создаёт FTS5-индекс и триггеры, если их нет.
+
+    Вызывается после каждой миграции: пересоздание таблицы posts_post
+    при миграциях SQLite удаляет её триггеры. Если чего-то не хватало,
+    индекс перестраивается целиком.
+    """
+    connection = connections[using]
+    if not is_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')"
+            " AND name LIKE %s",
+            [f'{FTS_TABLE}%'],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if FTS_TABLE in existing and TRIGGERS <= existing:
+            return
+        for sql in INSTALL_SQL:
+            cursor.execute(sql)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def to_match_query(text):
+    """Превращает ввод пользователя в безопасный запрос FTS5:
+    все слова обязательны, последнее — ещё и как префикс."""
+    words = re.findall(r'\w+', text.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class SearchResults:
+    """Ленивая выдача поиска для Paginator: count() и срезы.
+
+    Срез — это один запрос к FTS-индексу с LIMIT/OFFSET, отсортированный
+    по релевантности (bm25), и один запрос за самими постами.
+    """
+
+    def __init__(self, query, group=None, author=None, using='default'):
+        self.match = to_match_query(query)
+        self.group = group
+        self.author = author
+        self.using = using
+        self._count = None
+
+    def _where(self):
+        conditions = [f'{FTS_TABLE} MATCH %s']
+        params = [self.match]
+        if self.group:
+            conditions.append(
+                'p.group_id = (SELECT id FROM posts_group WHERE slug = %s)'
+            )
+            params.append(self.group)
+        if self.author:
+            conditions.append(
+                'p.author_id = (SELECT id FROM auth_user WHERE username = %s)'
+            )
+            params.append(self.author)
+        return ' AND '.join(conditions), params
+
+    def _execute(self, sql, params):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def count(self):
+        if self._count is None:
+            if self.match is None:
+                self._count = 0
+            else:
+                where, params = self._where()
+                self._count = self._execute(
+                    f'SELECT COUNT(*) FROM {FTS_TABLE} JOIN posts_post p '
+                    f'ON p.id = {FTS_TABLE}.rowid WHERE {where}',
+                    params,
+                )[0][0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if self.match is None:
+            return []
+        start = index.start or 0
+        limit = -1 if index.stop is None else index.stop - start
+        where, params = self._where()
+        ids = [
+            row[0] for row in self._execute(
+                f'SELECT p.id FROM {FTS_TABLE} JOIN posts_post p '
+                f'ON p.id = {FTS_TABLE}.rowid WHERE {where} '
+                f'ORDER BY {FTS_TABLE}.rank LIMIT %s OFFSET %s',
+                params + [limit, start],
+            )
+        ]
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search_posts(query, group=None, author=None, using='default'):
+    """Посты по запросу: ранжированные через FTS5 или, на других СУБД,
+    простым icontains, отсортированным по дате."""
+    if is_supported(connections[using]):
+        return SearchResults(query, group=group, author=author, using=using)
+    posts = Post.objects.select_related('author', 'group').filter(
+        text__icontains=query
+    )
+    if group:
+        posts = posts.filter(group__slug=group)
+    if author:
+        posts = posts.filter(author__username=author)
+    return posts
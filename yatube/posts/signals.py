@@ -0,0 +1,157 @@
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core import jobs
+
+from . import cache, counters, follow_graph, timeline
+from .models import (
+    ArchivedPost, Comment, Follow, Group, Post, User, UserCounters
+)
+
+
+def _touch_posts(**lookups):
+    """Сдвигает версию горячих и архивных постов: карточки кешируются
+    по версии и без её смены показывали бы старое имя автора, название
+    группы или ссылку на удалённую."""
+    for model in (Post, ArchivedPost):
+        model.objects.filter(**lookups).update(
+            version=F('version') + 1, updated=timezone.now()
+        )
+
+
+def _username(user_id):
+    return User.objects.filter(pk=user_id).values_list(
+        'username', flat=True
+    ).first()
+
+
+def _post_scopes(post):
+    """Области кеша страниц, на которых виден пост."""
+    scopes = ['index', f'profile:{_username(post.author_id)}']
+    group_ids = {post.group_id, getattr(post, '_initial_group_id', None)}
+    group_ids.discard(None)
+    for slug in Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True
+    ):
+        scopes.append(f'group:{slug}')
+    return scopes
+
+
+def _display_name(user):
+    # __dict__, а не атрибуты: у отложенных полей (only/defer)
+    # обращение к атрибуту стоило бы отдельного запроса.
+    return tuple(
+        user.__dict__.get(field)
+        for field in ('username', 'first_name', 'last_name')
+    )
+
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    instance._initial_display_name = _display_name(instance)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        # Нового пользователя ещё нет ни на одной странице: сбрасывать
+        # кеш всего сайта на каждую регистрацию незачем.
+        UserCounters.objects.get_or_create(user=instance)
+    elif instance._initial_display_name != _display_name(instance):
+        _touch_posts(author=instance)
+        cache.bump('users')
+    instance._initial_display_name = _display_name(instance)
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    instance._initial_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    # Версия сдвигается в самом UPDATE, а не по значению в экземпляре:
+    # он мог устареть, и параллельные сохранения записали бы одну версию.
+    if not instance._state.adding:
+        instance.version = F('version') + 1
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if hasattr(instance.version, 'resolve_expression'):
+        instance.refresh_from_db(fields=['version'])
+    if created:
+        counters.change_user_counters(instance.author_id, posts_count=1)
+        jobs.enqueue(timeline.fan_out_post, instance.pk, queue='timeline')
+    cache.bump(*_post_scopes(instance))
+    instance._initial_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user_counters(instance.author_id, posts_count=-1)
+    cache.bump(*_post_scopes(instance))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments_count(instance.post_id, 1)
+    cache.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments_count(instance.post_id, -1)
+    cache.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if not created:
+        _touch_posts(group=instance)
+    cache.bump('groups', f'group:{instance.slug}')
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # SET_NULL у постов — UPDATE без сигналов, поэтому версия
+    # сдвигается здесь, до него.
+    _touch_posts(group=instance)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    cache.bump('index', 'groups', f'group:{instance.slug}')
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_counters(instance.author_id, followers_count=1)
+        counters.change_user_counters(instance.user_id, following_count=1)
+        jobs.enqueue(
+            timeline.backfill, instance.user_id, instance.author_id,
+            queue='timeline', priority=jobs.PRIORITY_HIGH,
+        )
+    _follow_changed(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user_counters(instance.author_id, followers_count=-1)
+    counters.change_user_counters(instance.user_id, following_count=-1)
+    timeline.prune(instance.user_id, instance.author_id)
+    _follow_changed(instance)
+
+
+def _follow_changed(follow):
+    follow_graph.invalidate(follow.user_id)
+    cache.bump(
+        f'profile:{_username(follow.author_id)}',
+        f'profile:{_username(follow.user_id)}',
+    )
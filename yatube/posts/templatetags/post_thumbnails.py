@@ -0,0 +1,11 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, geometry):
+    """Готовая миниатюра поста или None — тогда рисуется заглушка."""
+    return thumbnails.get_ready(post, geometry)
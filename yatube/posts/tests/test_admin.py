@@ -0,0 +1,114 @@
+from unittest import mock
+
+from django.contrib.admin import helpers
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.admin import PostAdmin
+from posts.models import Post, Group
+
+User = get_user_model()
+
+
+class PostAdminTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.group = Group.objects.create(
+            title='Первая группа', slug='first', description='Описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Вторая группа', slug='second', description='Описание'
+        )
+        cls.url = reverse('admin:posts_post_changelist')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        # Прогрев кеша пользователя: вход сбрасывает его через last_login.
+        self.client.get(self.url)
+
+    def add_posts(self, count):
+        start = Post.objects.count()
+        for i in range(start, start + count):
+            author = User.objects.create_user(username=f'author_{i}')
+            Post.objects.create(author=author, group=self.group, text=i)
+            Group.objects.create(title=i, slug=f'group_{i}', description=i)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow(self):
+        """Число запросов списка не зависит от числа строк и групп"""
+        self.add_posts(2)
+        few = self.count_queries(self.url)
+        self.add_posts(10)
+        many = self.count_queries(self.url)
+
+        self.assertEqual(few, many)
+
+    def test_all_pages_reachable(self):
+        """Счёт строк точный, и до последней страницы можно дойти"""
+        self.add_posts(3)
+        with mock.patch.object(PostAdmin, 'list_per_page', 1):
+            response = self.client.get(self.url, {'p': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertEqual(len(response.context['cl'].result_list), 1)
+
+    def test_search_uses_index(self):
+        """Поиск в админке находит посты по словам"""
+        post = Post.objects.create(author=self.admin, text='Редкое слово')
+        Post.objects.create(author=self.admin, text='Обычный текст')
+
+        response = self.client.get(self.url, {'q': 'редкое'})
+
+        self.assertEqual(
+            list(response.context['cl'].result_list), [post]
+        )
+
+    def test_move_to_group(self):
+        """Действие переносит посты в группу и сбрасывает кеш"""
+        posts = [
+            Post.objects.create(author=self.admin, group=self.group, text=i)
+            for i in range(3)
+        ]
+        self.client.get(reverse('posts:index'))
+        version = posts[0].version
+        data = {
+            'action': 'move_to_group',
+            helpers.ACTION_CHECKBOX_NAME: [post.pk for post in posts[:2]],
+        }
+
+        confirm = self.client.post(self.url, data)
+        self.assertTemplateUsed(confirm, 'admin/posts/post/move_to_group.html')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {
+                **data, 'apply': '1', 'group': self.other_group.pk,
+            })
+        updates = [
+            query for query in queries
+            if query['sql'].startswith('UPDATE "posts_post"')
+        ]
+        self.assertRedirects(response, self.url)
+        self.assertEqual(len(updates), 1)
+        for post in posts:
+            post.refresh_from_db()
+        self.assertEqual(
+            [post.group for post in posts],
+            [self.other_group, self.other_group, self.group],
+        )
+        self.assertEqual(posts[0].version, version + 1)
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': 'second'})
+        )
+        self.assertEqual(len(response.context['page_obj']), 2)
@@ -0,0 +1,174 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from posts import counters
+from posts.models import (
+    ArchivedComment, ArchivedPost, Comment, Follow, Group, Post,
+    TimelineEntry
+)
+
+User = get_user_model()
+
+
+class ArchiveTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        now = timezone.now()
+        self.old = []
+        for i in range(3):
+            post = Post.objects.create(
+                author=self.author, group=self.group, text=f'Старый {i}'
+            )
+            Comment.objects.create(
+                post=post, author=self.reader, text=f'Ответ {i}'
+            )
+            Post.objects.filter(pk=post.pk).update(
+                created=now - timedelta(days=400 - i)
+            )
+            self.old.append(post)
+        self.hot = [
+            Post.objects.create(author=self.author, text=f'Новый {i}')
+            for i in range(2)
+        ]
+
+    def archive(self):
+        call_command(
+            'archive_posts', older_than=365, batch_size=2, stdout=StringIO()
+        )
+
+    def test_moves_old_posts_with_comments(self):
+        """Старые посты и их комментарии переезжают в архив"""
+        self.archive()
+
+        self.assertEqual(
+            set(Post.objects.values_list('pk', flat=True)),
+            {post.pk for post in self.hot},
+        )
+        self.assertEqual(
+            set(ArchivedPost.objects.values_list('pk', flat=True)),
+            {post.pk for post in self.old},
+        )
+        self.assertEqual(Comment.objects.count(), 0)
+        self.assertEqual(ArchivedComment.objects.count(), 3)
+        self.assertFalse(
+            TimelineEntry.objects.filter(post_id=self.old[0].pk).exists()
+        )
+        archived = ArchivedPost.objects.get(pk=self.old[0].pk)
+        self.assertEqual(archived.text, 'Старый 0')
+        self.assertEqual(archived.group, self.group)
+        self.assertEqual(archived.comments_count, 1)
+
+    def test_counters(self):
+        """Архивные посты остаются в числе постов автора"""
+        self.archive()
+        self.author.counters.refresh_from_db()
+        self.assertEqual(self.author.counters.posts_count, 5)
+        self.assertEqual(self.author.counters.archived_posts_count, 3)
+
+        counters.recount()
+        self.author.counters.refresh_from_db()
+        self.assertEqual(self.author.counters.posts_count, 5)
+        self.assertEqual(self.author.counters.archived_posts_count, 3)
+
+    def test_post_detail_reads_archive(self):
+        """Архивный пост открывается по старому адресу, но без правки"""
+        self.archive()
+        self.client.force_login(self.author)
+        post = self.old[0]
+
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Старый 0')
+        self.assertContains(response, 'Ответ 0')
+        self.assertNotContains(
+            response, reverse('posts:post_edit', kwargs={'post_id': post.pk})
+        )
+        self.assertNotContains(
+            response,
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+        )
+        response = self.client.get(
+            reverse('posts:comments', kwargs={'post_id': post.pk}),
+            {'format': 'json'},
+        )
+        self.assertEqual(response.json()['comments'][0]['text'], 'Ответ 0')
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': 10 ** 6})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(POSTS_IN_PAGE=2)
+    def test_profile_continues_into_archive(self):
+        """Профиль листается от горячих постов к архивным"""
+        self.archive()
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        pages = [
+            [
+                post.text for post in
+                self.client.get(url, {'page': number}).context['page_obj']
+            ]
+            for number in (1, 2, 3)
+        ]
+
+        self.assertEqual(pages, [
+            ['Новый 1', 'Новый 0'],
+            ['Старый 2', 'Старый 1'],
+            ['Старый 0'],
+        ])
+
+    @override_settings(POSTS_IN_PAGE=2, POSTS_PAGINATION='cursor')
+    def test_profile_cursor_continues_into_archive(self):
+        """Keyset-пагинация профиля тоже доходит до архива и обратно"""
+        self.archive()
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        pages = []
+        params = {}
+        while True:
+            page = self.client.get(url, params).context['page_obj']
+            pages.append([post.text for post in page])
+            if not page.has_next():
+                break
+            params = {'after': page.next_cursor}
+
+        self.assertEqual(pages, [
+            ['Новый 1', 'Новый 0'],
+            ['Старый 2', 'Старый 1'],
+            ['Старый 0'],
+        ])
+        back = self.client.get(url, {'before': page.previous_cursor})
+        self.assertEqual(
+            [post.text for post in back.context['page_obj']],
+            ['Старый 2', 'Старый 1'],
+        )
+
+    def test_renames_touch_archived_posts(self):
+        """Смена имени автора и группы сдвигает версию архивных постов"""
+        self.archive()
+        post = ArchivedPost.objects.get(pk=self.old[0].pk)
+
+        self.author.first_name = 'Новое'
+        self.author.save()
+        self.group.title = 'Другая группа'
+        self.group.save()
+        post.refresh_from_db()
+        self.assertEqual(post.version, 3)
+
+        self.group.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.version, 4)
+        self.assertIsNone(post.group)
@@ -0,0 +1,107 @@
+import copy
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from posts import benchmark
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class BenchmarkTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост для замеров'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        User.objects.create_user(username='staff', is_staff=True)
+
+    def test_report_covers_get_pages(self):
+        """Отчёт содержит все GET-страницы для обоих клиентов и режимов"""
+        report = benchmark.run(iterations=1)
+
+        names = {key.split()[0] for key in report['results']}
+        self.assertIn('index', names)
+        self.assertIn('search', names)
+        self.assertNotIn('add_comment', names)
+        self.assertEqual(
+            len(report['results']),
+            len(names) * 4 - len(benchmark.ACCESS) * 2,
+        )
+        index = report['results']['index anonymous warm']
+        self.assertEqual(index['status'], 200)
+        self.assertEqual(index['queries'], 0)
+        self.assertGreater(index['bytes'], 0)
+        self.assertEqual(
+            report['results']['search anonymous cold']['status'], 200
+        )
+
+    def test_pages_requested_by_allowed_users(self):
+        """Закрытые страницы замеряются под тем, кто может их открыть"""
+        results = benchmark.run(iterations=1)['results']
+
+        for key in (
+            'post_create authenticated warm',
+            'follow_index authenticated warm',
+            'post_edit author warm',
+            'profile_export author warm',
+            'group_export staff warm',
+        ):
+            with self.subTest(key=key):
+                self.assertEqual(results[key]['status'], 200)
+        self.assertNotIn('post_edit anonymous warm', results)
+        self.assertNotIn('group_export authenticated warm', results)
+        self.assertEqual(
+            {result['status'] for result in results.values()}, {200}
+        )
+
+    def test_staff_pages_skipped_without_staff(self):
+        """Без персонала в базе страницы для персонала пропускаются"""
+        User.objects.filter(is_staff=True).update(is_staff=False)
+
+        results = benchmark.run(iterations=1)['results']
+
+        self.assertFalse(
+            [key for key in results if key.startswith('group_export')]
+        )
+
+    def test_compare_with_baseline(self):
+        """Рост метрик сверх порогов считается регрессией"""
+        baseline = {'results': {
+            'index anonymous cold': {
+                'status': 200, 'p95_ms': 10, 'queries': 2, 'bytes': 100,
+            }
+        }}
+        report = copy.deepcopy(baseline)
+        self.assertEqual(benchmark.compare(report, baseline), [])
+
+        result = report['results']['index anonymous cold']
+        result.update(p95_ms=12, queries=3, bytes=105)
+        regressions = benchmark.compare(report, baseline, latency=0.25)
+
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('queries', regressions[0])
+
+    def test_compare_status_change(self):
+        """Смена кода ответа — регрессия, даже если страница стала быстрее"""
+        baseline = {'results': {
+            'index anonymous cold': {
+                'status': 200, 'p95_ms': 10, 'queries': 2, 'bytes': 100,
+            }
+        }}
+        report = copy.deepcopy(baseline)
+        report['results']['index anonymous cold'].update(
+            status=302, p95_ms=1, queries=0, bytes=0
+        )
+
+        regressions = benchmark.compare(report, baseline)
+
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('status 302', regressions[0])
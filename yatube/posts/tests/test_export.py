@@ -0,0 +1,140 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from posts import archive
+from posts.export import iter_records
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ExportTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group, text=i)
+            for i in range(5)
+        ]
+        Post.objects.create(author=cls.staff, text='Чужой пост')
+        for post in cls.posts[:2]:
+            Comment.objects.create(post=post, author=cls.reader, text='Ок')
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_access(self):
+        """Выгрузка доступна автору и staff, остальным — 404"""
+        profile_url = reverse(
+            'posts:profile_export', kwargs={'username': 'author'}
+        )
+        group_url = reverse('posts:group_export', kwargs={'slug': 'group'})
+        cases = [
+            (self.author, profile_url, 200),
+            (self.staff, profile_url, 200),
+            (self.reader, profile_url, 404),
+            (self.staff, group_url, 200),
+            (self.author, group_url, 404),
+        ]
+        for user, url, status in cases:
+            with self.subTest(user=user.username, url=url):
+                self.client.force_login(user)
+                self.assertEqual(self.client.get(url).status_code, status)
+        self.client.logout()
+        response = self.client.get(group_url)
+        self.assertRedirects(response, f'/auth/login/?next={group_url}')
+
+    def test_export_jsonl(self):
+        """JSONL содержит посты группы и их комментарии"""
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            reverse('posts:group_export', kwargs={'slug': 'group'})
+        )
+        records = [
+            json.loads(line) for line in self.read(response).splitlines()
+        ]
+
+        self.assertEqual(
+            [record['type'] for record in records].count('post'), 5
+        )
+        self.assertEqual(
+            [record['type'] for record in records].count('comment'), 2
+        )
+        self.assertEqual(records[0]['group'], 'group')
+        self.assertEqual(records[0]['author'], 'author')
+
+    def test_export_csv(self):
+        """CSV выгружается с заголовком"""
+        self.client.force_login(self.author)
+        response = self.client.get(
+            reverse('posts:profile_export', kwargs={'username': 'author'}),
+            {'format': 'csv'},
+        )
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[-1]['type'], 'comment')
+
+    def test_records_by_windows(self):
+        """Посты читаются окнами, каждое — фиксированным числом запросов"""
+        with self.assertNumQueries(8):
+            records = list(iter_records(batch_size=2))
+        self.assertEqual(len(records), 8)
+
+    def test_archived_after_hot(self):
+        """Архивные посты автора выгружаются после горячих"""
+        archived = self.posts[0]
+        archive.archive_posts([archived.pk])
+        self.client.force_login(self.author)
+        response = self.client.get(
+            reverse('posts:profile_export', kwargs={'username': 'author'})
+        )
+        records = [
+            json.loads(line) for line in self.read(response).splitlines()
+        ]
+
+        self.assertEqual(
+            [record['type'] for record in records[-2:]], ['post', 'comment']
+        )
+        self.assertEqual(records[-2]['id'], archived.pk)
+        self.assertEqual(records[-1]['post'], archived.pk)
+        self.assertEqual(
+            [record['type'] for record in records].count('post'), 5
+        )
+        self.assertEqual(
+            [record['type'] for record in records].count('comment'), 2
+        )
+
+    def test_command_round_trip(self):
+        """Выгрузка команды загружается обратно import_content"""
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'author.csv')
+        call_command(
+            'export_content', author='author', format='csv', output=path
+        )
+        Post.objects.filter(author=self.author).delete()
+
+        call_command('import_content', path, stdout=StringIO())
+
+        self.assertEqual(
+            Post.objects.filter(author=self.author).count(), 5
+        )
+        self.assertEqual(Comment.objects.count(), 2)
@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from posts import follow_graph
+from posts.models import Follow
+
+User = get_user_model()
+
+
+class FollowGraphTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author_{i}')
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_follow_is_idempotent(self):
+        """Повторная подписка и подписка на себя не создают записей"""
+        author = self.authors[0]
+
+        self.assertTrue(follow_graph.follow(self.user, author))
+        self.assertFalse(follow_graph.follow(self.user, author))
+        self.assertFalse(follow_graph.follow(self.user, self.user))
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertTrue(follow_graph.unfollow(self.user, author))
+        self.assertFalse(follow_graph.unfollow(self.user, author))
+
+    def test_following_set_is_cached(self):
+        """Проверка подписки после первой не ходит в базу"""
+        follow_graph.follow(self.user, self.authors[0])
+        follow_graph.is_following(self.user, self.authors[0])
+
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follow_graph.is_following(self.user, self.authors[0])
+            )
+            self.assertFalse(
+                follow_graph.is_following(self.user, self.authors[1])
+            )
+
+    def test_cache_follows_writes(self):
+        """Кеш подписок сбрасывается при подписке и отписке"""
+        author = self.authors[0]
+        self.assertFalse(follow_graph.is_following(self.user, author))
+
+        follow_graph.follow(self.user, author)
+        self.assertTrue(follow_graph.is_following(self.user, author))
+
+        Follow.objects.filter(user=self.user).delete()
+        self.assertFalse(follow_graph.is_following(self.user, author))
+
+    @override_settings(POSTS_IN_PAGE=2)
+    def test_paged_lists(self):
+        """Списки подписок листаются keyset-страницами"""
+        for author in self.authors:
+            follow_graph.follow(self.user, author)
+
+        pages = []
+        after = None
+        while True:
+            page = follow_graph.following(self.user, after=after)
+            pages.append([user.username for user in page])
+            if not page.has_next():
+                break
+            after = page.next_after
+
+        self.assertEqual(pages, [
+            ['author_4', 'author_3'], ['author_2', 'author_1'], ['author_0'],
+        ])
+        followers = follow_graph.followers(self.authors[0])
+        self.assertEqual(list(followers), [self.user])
+
+    def test_list_pages(self):
+        """Страницы подписчиков и подписок открываются всем"""
+        follow_graph.follow(self.user, self.authors[0])
+        urls = {
+            reverse('posts:followers', args=['author_0']): 'reader',
+            reverse('posts:following', args=['reader']): 'author_0',
+        }
+        for url, username in urls.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTemplateUsed(response, 'posts/follow_list.html')
+                self.assertEqual(
+                    [user.username for user in response.context['page_obj']],
+                    [username],
+                )
+        response = self.client.get(
+            reverse('posts:followers', args=['missing'])
+        )
+        self.assertEqual(response.status_code, 404)
@@ -1,50 +1,19 @@
-import shutil
-import tempfile
 from http import HTTPStatus
 from django.conf import settings
 from django.urls import reverse
 from django.test import TestCase, Client, override_settings
-from posts.models import Post, Group
+from posts.models import ArchivedPost, Post
+from posts import archive, thumbnails
+from posts.thumbnails import lookup_backend
 from django.contrib.auth import get_user_model
-from django.core.files.uploadedfile import SimpleUploadedFile
-
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+from django.core.cache import cache
+from posts.tests.utils import PostsFixtureMixin
 
 User = get_user_model()
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
-class PostsFormBaseTestCase(TestCase):
+class PostsFormBaseTestCase(PostsFixtureMixin, TestCase):
     """Базовый класс для фикстур"""
-    @classmethod
-    def setUpClass(cls):
-        super().setUpClass()
-        cls.username = 'auth'
-        cls.title = 'Тестовая группа'
-        cls.slug = 'test_slug'
-        cls.description = 'Тестовое описание'
-        cls.text = 'Тестовый текст поста'
-        cls.user = User.objects.create_user(username=cls.username)
-        cls.group = Group.objects.create(
-            title=cls.title,
-            slug=cls.slug,
-            description=cls.description,
-        )
-        cls.group_for_edit = Group.objects.create(
-            title='Группа для редактирования',
-            slug='edit_slug',
-            description='any_descp',
-        )
-        cls.post = Post.objects.create(
-            author=cls.user,
-            text=cls.text,
-            group=cls.group
-        )
-
-    @classmethod
-    def tearDownClass(cls):
-        super().tearDownClass()
-        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
         self.authorized_client = Client()
@@ -53,23 +22,6 @@ class PostsFormBaseTestCase(TestCase):
 
 class PostFormTestCase(PostsFormBaseTestCase):
     """Тест формы Post"""
-    @classmethod
-    def setUpClass(cls):
-        super().setUpClass()
-
-        small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x02\x00'
-            b'\x01\x00\x80\x00\x00\x00\x00\x00'
-            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
-            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
-            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
-            b'\x0A\x00\x3B'
-        )
-        cls.uploaded = SimpleUploadedFile(
-            name='small.gif',
-            content=small_gif,
-            content_type='image/gif'
-        )
 
     def test_create_post_form(self):
         """POST тест валидной формы create_post"""
@@ -138,3 +90,53 @@ class PostFormTestCase(PostsFormBaseTestCase):
         self.assertEqual(response.status_code, HTTPStatus.OK)
         error = response.context.get('form').errors
         self.assertIn('Обязательное поле', str(error))
+
+    def test_create_post_generates_thumbnail(self):
+        """Миниатюра создаётся при сохранении поста с картинкой"""
+        self.uploaded.seek(0)
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Пост с картинкой', 'image': self.uploaded},
+        )
+        post = Post.objects.latest('created')
+
+        self.assertTrue(post.image)
+        self.assertIsNotNone(
+            lookup_backend.get_cached(
+                post.image, '960x339', **settings.POST_THUMBNAIL_SIZES[
+                    '960x339'
+                ]
+            )
+        )
+
+    @override_settings(BACKGROUND_TASKS_ASYNC=True)
+    def test_placeholder_until_thumbnail_ready(self):
+        """Пока миниатюра не готова, страница показывает заглушку"""
+        cache.clear()
+        self.uploaded.seek(0)
+        post = Post.objects.create(
+            author=self.user, text='Картинка', image=self.uploaded
+        )
+
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+
+        self.assertContains(response, 'bg-light" style="height: 339px')
+        self.assertNotContains(response, '/media/cache/')
+
+    @override_settings(BACKGROUND_TASKS_ASYNC=True)
+    def test_thumbnail_for_archived_post(self):
+        """Миниатюра архивного поста создаётся, а его версия растёт"""
+        self.uploaded.seek(0)
+        post = Post.objects.create(
+            author=self.user, text='Картинка', image=self.uploaded
+        )
+        archive.archive_posts([post.pk])
+        version = ArchivedPost.objects.get(pk=post.pk).version
+
+        thumbnails.generate(post.pk)
+
+        archived = ArchivedPost.objects.get(pk=post.pk)
+        self.assertEqual(archived.version, version + 1)
+        self.assertIsNotNone(thumbnails.get_ready(archived, '960x339'))
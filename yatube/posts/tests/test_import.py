@@ -0,0 +1,242 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from posts.models import (
+    Comment, Follow, Group, Post, TimelineEntry, UserCounters
+)
+
+User = get_user_model()
+
+
+class ImportContentTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(content)
+        return path
+
+    def write_jsonl(self, records):
+        return self.write(
+            'content.jsonl',
+            '\n'.join(json.dumps(record) for record in records)
+        )
+
+    def import_content(self, path, **options):
+        call_command('import_content', path, stdout=StringIO(), **options)
+
+    def test_import_jsonl(self):
+        """Импорт создаёт записи, авторов, группы и досчитывает счётчики"""
+        path = self.write_jsonl([
+            {
+                'type': 'post', 'id': 100, 'author': 'author',
+                'group': 'imported', 'text': 'Старый пост',
+                'created': '2015-05-01T10:00:00',
+            },
+            {
+                'type': 'post', 'id': 101, 'author': 'newcomer',
+                'text': 'Пост нового автора',
+            },
+            {
+                'type': 'comment', 'post': 100, 'author': 'newcomer',
+                'text': 'Комментарий',
+            },
+            {'type': 'follow', 'user': 'newcomer', 'author': 'author'},
+        ])
+
+        self.import_content(path, batch_size=2)
+
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.author, self.author)
+        self.assertEqual(post.group, Group.objects.get(slug='imported'))
+        self.assertEqual(post.created.year, 2015)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            Comment.objects.get().author.username, 'newcomer'
+        )
+        self.author.counters.refresh_from_db()
+        self.assertEqual(self.author.counters.posts_count, 1)
+        self.assertEqual(self.author.counters.followers_count, 2)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        newcomer = User.objects.get(username='newcomer')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=newcomer, post=post).exists()
+        )
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+    def test_keeps_created_without_id(self):
+        """Записи без id тоже сохраняют дату из файла"""
+        path = self.write_jsonl([
+            {'type': 'post', 'id': 5, 'author': 'author', 'text': 'С id'},
+            {
+                'type': 'post', 'author': 'author', 'text': 'Без id',
+                'created': '2016-01-02T03:04:05',
+            },
+            {
+                'type': 'comment', 'post': 5, 'author': 'reader',
+                'text': 'Ответ', 'created': '2017-01-02T03:04:05',
+            },
+        ])
+
+        self.import_content(path)
+
+        post = Post.objects.get(text='Без id')
+        self.assertEqual(post.pk, 6)
+        self.assertEqual(post.created.year, 2016)
+        self.assertEqual(Comment.objects.get().created.year, 2017)
+        self.assertEqual(Post.objects.get(pk=5).comments_count, 1)
+
+    def test_recount_only_affected_users(self):
+        """Счётчики пересчитываются только у затронутых импортом"""
+        bystander = User.objects.create_user(username='bystander')
+        UserCounters.objects.filter(user=bystander).update(posts_count=42)
+        path = self.write_jsonl([
+            {'type': 'post', 'id': 1, 'author': 'author', 'text': 'Один'},
+        ])
+
+        self.import_content(path)
+
+        self.assertEqual(
+            UserCounters.objects.get(user=bystander).posts_count, 42
+        )
+        self.author.counters.refresh_from_db()
+        self.assertEqual(self.author.counters.posts_count, 1)
+
+    def test_import_csv(self):
+        """CSV с пустыми колонками читается так же, как JSONL"""
+        path = self.write(
+            'content.csv',
+            'type,id,author,group,text,post,user\n'
+            'post,7,author,,Пост из CSV,,\n'
+            'comment,,author,,Ответ,7,\n'
+        )
+
+        self.import_content(path)
+
+        self.assertIsNone(Post.objects.get(pk=7).group)
+        self.assertEqual(Comment.objects.get().post_id, 7)
+
+    def test_resume_from_checkpoint(self):
+        """Импорт продолжается с места, записанного в checkpoint"""
+        path = self.write_jsonl([
+            {'type': 'post', 'id': 1, 'author': 'author', 'text': 'Один'},
+            {'type': 'post', 'id': 2, 'author': 'author', 'text': 'Два'},
+            {'type': 'post', 'author': 'author', 'text': 'Три'},
+        ])
+        self.write('content.jsonl.checkpoint', '2')
+
+        self.import_content(path)
+
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)), ['Три']
+        )
+
+    def test_repeated_batch_is_skipped(self):
+        """Повторный импорт записей с id и с датой не создаёт дублей"""
+        path = self.write_jsonl([
+            {'type': 'post', 'id': 1, 'author': 'author', 'text': 'Один'},
+            {
+                'type': 'post', 'author': 'author', 'text': 'Без id',
+                'created': '2016-01-02T03:04:05',
+            },
+            {
+                'type': 'comment', 'post': 1, 'author': 'reader',
+                'text': 'Ответ', 'created': '2017-01-02T03:04:05',
+            },
+            {'type': 'follow', 'user': 'reader', 'author': 'author'},
+        ])
+
+        self.import_content(path)
+        self.import_content(path)
+
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(Post.objects.get(pk=1).comments_count, 1)
+
+    def test_resume_recounts_earlier_batches(self):
+        """После сбоя и возобновления досчитываются и прошлые пачки"""
+        records = [
+            {'type': 'post', 'id': 1, 'author': 'alice', 'text': 'Один'},
+            {'type': 'follow', 'user': 'reader', 'author': 'alice'},
+            {
+                'type': 'post', 'id': 2, 'author': 'alice', 'text': 'Два',
+                'created': 'вчера',
+            },
+        ]
+        path = self.write_jsonl(records)
+        with self.assertRaises(CommandError):
+            self.import_content(path, batch_size=2)
+
+        records[2]['created'] = '2020-01-01T00:00:00'
+        self.write_jsonl(records)
+        self.import_content(path, batch_size=2)
+
+        alice = User.objects.get(username='alice')
+        self.assertEqual(alice.counters.posts_count, 2)
+        self.assertEqual(alice.counters.followers_count, 1)
+        self.assertEqual(
+            UserCounters.objects.get(user=self.reader).following_count, 2
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+        self.assertFalse(os.path.exists(f'{path}.checkpoint.touched'))
+
+    def test_bad_record(self):
+        """Битая запись останавливает импорт с понятной ошибкой"""
+        path = self.write_jsonl([{'type': 'like', 'author': 'author'}])
+
+        with self.assertRaises(CommandError):
+            self.import_content(path)
+
+
+class GenerateDataTestCase(TestCase):
+    def generate(self, **options):
+        call_command('generate_data', stdout=StringIO(), **options)
+
+    def test_generate_data(self):
+        """Генератор создаёт заданный объём связанных данных"""
+        self.generate(
+            users=30, groups=3, posts=200, comments=100, follows=50, seed=1
+        )
+
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertGreater(Follow.objects.count(), 0)
+        self.assertTrue(TimelineEntry.objects.exists())
+        top = User.objects.order_by('-counters__posts_count').first()
+        self.assertGreater(top.counters.posts_count, 200 / 30)
+
+    def test_seed_is_reproducible(self):
+        """Одинаковый seed даёт одинаковые данные"""
+        texts = []
+        for _ in range(2):
+            Post.objects.all().delete()
+            User.objects.all().delete()
+            self.generate(users=10, groups=2, posts=20, comments=0, seed=7)
+            texts.append(list(
+                Post.objects.order_by('id').values_list('text', flat=True)
+            ))
+
+        self.assertEqual(texts[0], texts[1])
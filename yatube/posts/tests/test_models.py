@@ -1,6 +1,8 @@
+from io import StringIO
 from django.contrib.auth import get_user_model
-from django.test import TestCase
-from posts.models import Post, Group
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from posts.models import Post, Group, Comment, Follow, UserCounters
 
 User = get_user_model()
 
@@ -70,6 +72,20 @@ class PostModelTestCase(PostBaseTestCase):
                 self.assertEqual(
                     post._meta.get_field(value).help_text, expected)
 
+    def test_version_from_stale_instances(self):
+        """Сохранения устаревших экземпляров не пишут одну версию"""
+        first = Post.objects.get(pk=self.post.pk)
+        second = Post.objects.get(pk=self.post.pk)
+
+        first.text = 'Первая правка'
+        first.save()
+        second.text = 'Вторая правка'
+        second.save()
+
+        self.assertEqual(second.version, first.version + 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, second.version)
+
 
 class GroupModelTestCase(PostBaseTestCase):
     """ Класс для тестирования модели Group"""
@@ -99,3 +115,84 @@ class GroupModelTestCase(PostBaseTestCase):
             with self.subTest(value=value):
                 self.assertEqual(
                     group._meta.get_field(value).help_text, expected)
+
+
+class CountersTestCase(PostBaseTestCase):
+    """Класс для тестирования денормализованных счётчиков"""
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками"""
+        reader = User.objects.create_user(username='reader')
+        comment = Comment.objects.create(
+            post=self.post, author=reader, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=reader, author=self.user)
+
+        self.post.refresh_from_db()
+        self.user.counters.refresh_from_db()
+        reader.counters.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.user.counters.posts_count, 1)
+        self.assertEqual(self.user.counters.followers_count, 1)
+        self.assertEqual(reader.counters.following_count, 1)
+
+        comment.delete()
+        follow.delete()
+        Post.objects.create(author=self.user, text='Второй пост')
+
+        self.post.refresh_from_db()
+        self.user.counters.refresh_from_db()
+        reader.counters.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(self.user.counters.posts_count, 2)
+        self.assertEqual(self.user.counters.followers_count, 0)
+        self.assertEqual(reader.counters.following_count, 0)
+
+    def test_recount_command(self):
+        """recount_counters исправляет расхождение счётчиков"""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        Comment.objects.create(post=self.post, author=reader, text='Ок')
+        UserCounters.objects.update(
+            posts_count=100, followers_count=100, following_count=100
+        )
+        UserCounters.objects.filter(user=reader).delete()
+        Post.objects.update(comments_count=100)
+
+        call_command('recount_counters', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(
+            list(
+                UserCounters.objects.order_by('user_id').values_list(
+                    'user__username',
+                    'posts_count',
+                    'followers_count',
+                    'following_count',
+                )
+            ),
+            [('auth', 1, 1, 0), ('reader', 0, 0, 1)]
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+
+class UserDeleteTestCase(TransactionTestCase):
+    """Удаление пользователя с коммитом: SQLite проверяет внешние ключи"""
+
+    def test_delete_user_with_posts_and_follows(self):
+        """Пользователь с постами, комментариями и подписками удаляется"""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        post = Post.objects.create(author=author, text='Пост')
+        Comment.objects.create(post=post, author=reader, text='Ответ')
+        Follow.objects.create(user=reader, author=author)
+        Follow.objects.create(user=author, author=reader)
+
+        author_id = author.pk
+        author.delete()
+
+        self.assertFalse(User.objects.filter(pk=author_id).exists())
+        self.assertFalse(UserCounters.objects.filter(user=author_id).exists())
+        reader.counters.refresh_from_db()
+        self.assertEqual(reader.counters.followers_count, 0)
+        self.assertEqual(reader.counters.following_count, 0)
@@ -0,0 +1,105 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import thumbnails
+from posts.models import Post, Comment, Follow
+from posts.tests.utils import PostsFixtureMixin, TempMediaMixin, small_gif
+
+User = get_user_model()
+
+
+class NumQueriesTestCase(PostsFixtureMixin, TestCase):
+    """Число запросов страниц не зависит от количества постов"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def add_content(self, count):
+        for i in range(count):
+            author = User.objects.create_user(username=f'author_{i}')
+            Post.objects.create(author=self.user, group=self.group, text=i)
+            Post.objects.create(author=author, group=self.group, text=i)
+            Comment.objects.create(post=self.post, author=author, text=i)
+
+    def count_queries(self, client, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        return len(queries)
+
+    def test_query_budget(self):
+        """Страницы укладываются в фиксированный бюджет запросов"""
+        # Группа, профиль и пост тратят по запросу на валидаторы
+        # условного GET: ими же отвечают 304 без рендера.
+        pages = [
+            (self.guest_client, reverse('posts:index'), 2),
+            (
+                self.guest_client,
+                reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+                4
+            ),
+            (
+                self.guest_client,
+                reverse('posts:profile', kwargs={'username': self.user}),
+                4
+            ),
+            (
+                self.guest_client,
+                reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+                3
+            ),
+            (self.authorized_client, reverse('posts:follow_index'), 4),
+        ]
+        few = [self.count_queries(client, url) for client, url, _ in pages]
+        self.add_content(12)
+        many = [self.count_queries(client, url) for client, url, _ in pages]
+
+        for (_, url, budget), before, after in zip(pages, few, many):
+            with self.subTest(url=url):
+                self.assertEqual(before, after)
+                self.assertLessEqual(after, budget)
+
+
+class ThumbnailQueriesTestCase(TempMediaMixin, TestCase):
+    """Миниатюры страницы читаются одним пакетом"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def add_image_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                author=self.user,
+                text=f'Картинка {i}',
+                image=small_gif(f'{i}.gif')
+            )
+            thumbnails.generate(post.pk)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def test_thumbnail_lookups_batched(self):
+        """Число запросов не растёт с числом картинок на странице"""
+        url = reverse('posts:index')
+        self.add_image_posts(2)
+        few = self.count_queries(url)
+        self.add_image_posts(6)
+        many = self.count_queries(url)
+
+        self.assertEqual(few, many)
@@ -0,0 +1,65 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.template.base import Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post
+
+User = get_user_model()
+
+
+class ProfilingMiddlewareTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_disabled_by_default(self):
+        """Без REQUEST_PROFILING заголовка нет"""
+        response = self.client.get(reverse('posts:index'))
+
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(REQUEST_PROFILING=True)
+    def test_server_timing(self):
+        """Заголовок и лог содержат время SQL, шаблонов и кеш"""
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            response = self.client.get(reverse('posts:index'))
+
+        timing = response['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="2 queries"')
+        self.assertIn('tpl;dur=', timing)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], '/')
+        self.assertEqual(record['db_queries'], 2)
+        self.assertGreater(record['cache_misses'], 0)
+
+    @override_settings(REQUEST_PROFILING=True)
+    def test_cached_page(self):
+        """Повторный запрос обслуживается кешем без SQL"""
+        self.client.get(reverse('posts:index'))
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['db_queries'], 0)
+        self.assertEqual(record['cache_misses'], 0)
+        self.assertGreater(record['cache_hits'], 0)
+
+    @override_settings(REQUEST_PROFILING=True)
+    def test_restores_patched_methods(self):
+        """После запроса шаблоны и кеш работают без обёрток"""
+        render = Template.render
+        get = type(caches['default']).get
+
+        self.client.get(reverse('posts:index'))
+
+        self.assertIs(Template.render, render)
+        self.assertIs(type(caches['default']).get, get)
@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.urls import reverse
+from posts.models import Post, Group
+
+User = get_user_model()
+
+
+class SearchTestCase(TestCase):
+    """Тест полнотекстового поиска"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.url = reverse('posts:search')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def found(self, **params):
+        response = self.guest_client.get(self.url, params)
+        return [post.text for post in response.context.get('page_obj')]
+
+    def test_ranked_results(self):
+        """Пост с большим числом совпадений выше в выдаче"""
+        Post.objects.create(author=self.user, text='Питон и змеи')
+        Post.objects.create(author=self.user, text='Питон, питон, питон')
+        Post.objects.create(author=self.user, text='Про котов')
+
+        self.assertEqual(
+            self.found(q='питон'),
+            ['Питон, питон, питон', 'Питон и змеи']
+        )
+
+    def test_filters(self):
+        """Фильтры по группе и автору"""
+        Post.objects.create(author=self.user, text='Текст', group=self.group)
+        Post.objects.create(author=self.other, text='Текст другой')
+
+        self.assertEqual(
+            self.found(q='текст', group=self.group.slug), ['Текст']
+        )
+        self.assertEqual(self.found(q='текст', author='other'),
+                         ['Текст другой'])
+        self.assertEqual(self.found(q='текст', author='nobody'), [])
+
+    def test_index_follows_writes(self):
+        """Индекс обновляется при правке, удалении и bulk_create"""
+        post = Post.objects.create(author=self.user, text='Старый текст')
+        post.text = 'Новый текст'
+        post.save()
+        Post.objects.bulk_create([Post(author=self.user, text='Пакетный')])
+
+        self.assertEqual(self.found(q='старый'), [])
+        self.assertEqual(self.found(q='новый'), ['Новый текст'])
+        self.assertEqual(self.found(q='пакетн'), ['Пакетный'])
+
+        post.delete()
+        self.assertEqual(self.found(q='новый'), [])
+
+    def test_pagination(self):
+        """Выдача листается пагинатором проекта"""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Запрос {i}')
+            for i in range(settings.POSTS_IN_PAGE + 3)
+        )
+
+        response = self.guest_client.get(self.url, {'q': 'запрос'})
+        page_obj = response.context.get('page_obj')
+
+        self.assertEqual(len(page_obj), settings.POSTS_IN_PAGE)
+        self.assertEqual(page_obj.paginator.count, settings.POSTS_IN_PAGE + 3)
+        self.assertContains(response, 'href="?q=%D0%B7')
+        self.assertEqual(
+            len(self.found(q='запрос', page=2)), 3
+        )
+
+    def test_survives_table_rebuild(self):
+        """Потерянные при пересоздании таблицы триггеры восстанавливаются"""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_insert')
+        Post.objects.create(author=self.user, text='Переживёт миграцию')
+        self.assertEqual(self.found(q='переживёт'), [])
+
+        call_command('migrate', 'posts', verbosity=0)
+
+        self.assertEqual(self.found(q='переживёт'), ['Переживёт миграцию'])
+
+    def test_empty_query(self):
+        """Пустой запрос не ищет"""
+        response = self.guest_client.get(self.url, {'q': '!!!'})
+
+        self.assertEqual(len(response.context.get('page_obj')), 0)
+        self.assertContains(response, 'Ничего не найдено')
@@ -1,69 +1,27 @@
-import shutil
-import tempfile
+import time
 from http import HTTPStatus
 from django.urls import reverse
-from django.test import TestCase, Client
-from posts.models import Post, Group, Comment, Follow
+from django.test import (
+    TestCase, Client, RequestFactory, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from posts.models import Post, Group, Comment, Follow, TimelineEntry
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django import forms
-from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
-
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+from posts.paginator import page_rows
+from posts.tests.utils import PostsFixtureMixin
 
 User = get_user_model()
 
 
-class PostsBaseTestCase(TestCase):
+class PostsBaseTestCase(PostsFixtureMixin, TestCase):
     """Базовый класс дя фикстур"""
     post_count = 13
     posts_on_second_page = 4
-
-    @classmethod
-    def setUpClass(cls):
-        super().setUpClass()
-
-        small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x02\x00'
-            b'\x01\x00\x80\x00\x00\x00\x00\x00'
-            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
-            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
-            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
-            b'\x0A\x00\x3B'
-        )
-        cls.uploaded = SimpleUploadedFile(
-            name='small.gif',
-            content=small_gif,
-            content_type='image/gif'
-        )
-        cls.username = 'auth'
-        cls.title = 'Тестовая группа'
-        cls.slug = 'test_slug'
-        cls.description = 'Тестовое описание'
-        cls.text = 'Тестовый текст поста'
-        cls.user = User.objects.create_user(username=cls.username)
-        cls.group = Group.objects.create(
-            title=cls.title,
-            slug=cls.slug,
-            description=cls.description,
-        )
-        cls.group_for_edit = Group.objects.create(
-            title='Группа для редактирования',
-            slug='edit_slug',
-            description='any_descp',
-        )
-        cls.post = Post.objects.create(
-            author=cls.user,
-            text=cls.text,
-            group=cls.group,
-            image=cls.uploaded
-        )
-
-    @classmethod
-    def tearDownClass(cls):
-        super().tearDownClass()
-        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+    post_image = True
 
     def setUp(self):
         posts_list = []
@@ -137,6 +95,58 @@ class IndexTestCase(PostsBaseTestCase):
         )
 
 
+@override_settings(POSTS_PAGINATION='cursor')
+class CursorPaginatorTestCase(PostsBaseTestCase):
+    """Тест keyset-пагинации ленты"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.url = reverse('posts:index')
+
+    def test_pages_by_cursor(self):
+        """Переход вперёд и назад по токенам"""
+        first_page = self.guest_client.get(self.url).context.get('page_obj')
+        self.assertEqual(len(first_page), settings.POSTS_IN_PAGE)
+        self.assertTrue(first_page.has_next())
+        self.assertFalse(first_page.has_previous())
+
+        second_page = self.guest_client.get(
+            self.url, {'after': first_page.next_cursor}
+        ).context.get('page_obj')
+        self.assertEqual(len(second_page), self.posts_on_second_page)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        first_ids = {post.pk for post in first_page}
+        self.assertFalse(first_ids & {post.pk for post in second_page})
+
+        back_page = self.guest_client.get(
+            self.url, {'before': second_page.previous_cursor}
+        ).context.get('page_obj')
+        self.assertEqual(
+            [post.pk for post in back_page],
+            [post.pk for post in first_page]
+        )
+
+    def test_no_count_query(self):
+        """Страница не делает COUNT(*) и OFFSET"""
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(self.url)
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('COUNT(', query['sql'])
+                self.assertNotIn('OFFSET', query['sql'])
+
+    def test_broken_cursor(self):
+        """Битый токен отдаёт первую страницу"""
+        response = self.guest_client.get(self.url, {'after': '%%%'})
+
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            len(response.context.get('page_obj')), settings.POSTS_IN_PAGE
+        )
+
+
 class GroupPostsTestCase(PostsBaseTestCase):
     """Тест group_list views"""
 
@@ -291,6 +301,80 @@ class PostDetailTestCase(PostsBaseTestCase):
         self.assertEqual(Comment.objects.latest('created').text, comment)
 
 
+@override_settings(COMMENTS_IN_PAGE=3)
+class PostCommentsTestCase(PostsBaseTestCase):
+    """Комментарии поста листаются порциями"""
+
+    def setUp(self):
+        super().setUp()
+        self.comments = [
+            Comment.objects.create(
+                post=self.post, author=self.user, text=f'Комментарий {i}'
+            )
+            for i in range(7)
+        ]
+        self.comments.reverse()
+
+    def texts(self, comments):
+        return [comment.text for comment in comments]
+
+    def test_first_page_in_detail(self):
+        """На странице поста только первые комментарии"""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        comments = response.context['comments']
+
+        self.assertEqual(
+            self.texts(comments), self.texts(self.comments[:3])
+        )
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'data-chunk-url')
+
+    def test_html_chunks(self):
+        """Фрагменты продолжают список без пропусков и повторов"""
+        url = reverse('posts:comments', kwargs={'post_id': self.post.pk})
+        texts = []
+        after = ''
+        while True:
+            response = self.guest_client.get(url, {'after': after})
+            comments = response.context['comments']
+            self.assertTemplateUsed(
+                response, 'posts/includes/comment_list.html'
+            )
+            texts += self.texts(comments)
+            if not comments.has_next():
+                break
+            after = comments.next_cursor
+
+        self.assertEqual(texts, self.texts(self.comments))
+
+    def test_json_chunk(self):
+        """JSON-порция содержит авторов и курсор следующей"""
+        url = reverse('posts:comments', kwargs={'post_id': self.post.pk})
+
+        with self.assertNumQueries(2):
+            data = self.guest_client.get(url, {'format': 'json'}).json()
+
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            self.texts(self.comments[:3]),
+        )
+        self.assertEqual(data['comments'][0]['author'], self.username)
+        last = self.guest_client.get(
+            url, {'format': 'json', 'after': data['next']}
+        ).json()
+        self.assertEqual(len(last['comments']), 3)
+
+    def test_missing_post(self):
+        """Комментарии несуществующего поста — 404"""
+        response = self.guest_client.get(
+            reverse('posts:comments', kwargs={'post_id': 0})
+        )
+
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
 class PostCreateTestCase(PostsBaseTestCase):
     """Тест post_create views"""
 
@@ -329,6 +413,7 @@ class PostCreateTestCase(PostsBaseTestCase):
         new_text = 'new_text'
         group = self.group.pk
         image = self.uploaded
+        image.seek(0)
         data = {
             'text': new_text,
             'group': group,
@@ -410,15 +495,231 @@ class PostCacheTest(PostsBaseTestCase):
         """Тест кеширования index"""
 
         first_response = self.authorized_client.get(self.url)
-        self.second_post = Post.objects.create(
+        with CaptureQueriesContext(connection) as queries:
+            second_response = self.authorized_client.get(self.url)
+        self.assertEqual(first_response.content, second_response.content)
+        self.assertFalse(
+            [
+                query for query in queries.captured_queries
+                if '"posts_' in query['sql']
+            ]
+        )
+
+        Post.objects.create(
             author=self.user,
             text='кеш текст',
         )
-        second_response = self.authorized_client.get(self.url)
-        self.assertEqual(first_response.content, second_response.content)
-        cache.clear()
         response = self.authorized_client.get(self.url)
         self.assertNotEqual(second_response.content, response.content)
+        self.assertIn('кеш текст', response.content.decode())
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0.05)
+    def test_cache_expires_without_shared_cache(self):
+        """С кешем процесса страница живёт ограниченное время: сброс
+        поколения в другом воркере сюда не доходит"""
+        self.guest_client.get(self.url)
+        # bulk_create без сигналов — как изменение в другом процессе.
+        Post.objects.bulk_create([Post(author=self.user, text='чужой текст')])
+        self.assertNotIn(
+            'чужой текст', self.guest_client.get(self.url).content.decode()
+        )
+
+        time.sleep(0.1)
+
+        self.assertIn(
+            'чужой текст', self.guest_client.get(self.url).content.decode()
+        )
+
+    def test_signup_keeps_cache(self):
+        """Регистрация нового пользователя не сбрасывает кеш страниц"""
+        self.guest_client.get(self.url)
+        Post.objects.bulk_create([Post(author=self.user, text='без сброса')])
+
+        User.objects.create_user(username='newcomer')
+
+        self.assertNotIn(
+            'без сброса', self.guest_client.get(self.url).content.decode()
+        )
+
+    def test_cache_group_rename(self):
+        """Переименование группы сбрасывает кеш страниц"""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.guest_client.get(url)
+        self.group.title = 'Новое название'
+        self.group.save()
+
+        response = self.guest_client.get(url)
+
+        self.assertIn('Новое название', response.content.decode())
+
+    def test_cache_group_delete(self):
+        """Удаление группы убирает ссылку на неё из карточек постов"""
+        group = Group.objects.create(
+            title='Удаляемая', slug='doomed', description='Описание'
+        )
+        Post.objects.create(author=self.user, group=group, text='В группе')
+        group_url = reverse('posts:group_list', kwargs={'slug': 'doomed'})
+        self.assertIn(
+            group_url, self.guest_client.get(self.url).content.decode()
+        )
+
+        group.delete()
+
+        self.assertNotIn(
+            group_url, self.guest_client.get(self.url).content.decode()
+        )
+
+    def test_cache_per_user(self):
+        """Закешированная страница не отдаётся другому пользователю"""
+        self.authorized_client.get(self.url)
+
+        response = self.guest_client.get(self.url)
+
+        self.assertIn('Войти', response.content.decode())
+
+
+class PostFragmentCacheTest(PostsBaseTestCase):
+    """Тест кеша карточек постов"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.url = reverse('posts:follow_index')
+
+    def setUp(self):
+        super().setUp()
+        Follow.objects.create(user=self.user, author=self.user)
+
+    def test_fragment_reused(self):
+        """Карточка берётся из кеша, пока версия поста не изменилась"""
+        self.authorized_client.get(self.url)
+        Post.objects.filter(pk=self.post.pk).update(text='Скрытая правка')
+
+        response = self.authorized_client.get(self.url)
+
+        self.assertNotIn('Скрытая правка', response.content.decode())
+
+    def test_fragment_invalidated(self):
+        """Правка поста и имени автора сбрасывает карточку"""
+        self.authorized_client.get(self.url)
+        post = Post.objects.latest('created')
+        post.text = 'Видимая правка'
+        post.save()
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name = 'Новое'
+        author.last_name = 'Имя'
+        author.save()
+
+        content = self.authorized_client.get(self.url).content.decode()
+
+        self.assertIn('Видимая правка', content)
+        self.assertIn('Новое Имя', content)
+
+
+class ConditionalGetTest(PostsBaseTestCase):
+    """Неизменившиеся страницы отдаются как 304"""
+
+    def pages(self):
+        return [
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:group_list', kwargs={'slug': self.slug}),
+            reverse('posts:profile', kwargs={'username': self.username}),
+        ]
+
+    def test_not_modified(self):
+        """С ETag страница не рендерится заново"""
+        for url in self.pages():
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+
+                self.assertEqual(response.status_code, 304)
+                self.assertLessEqual(len(queries), 1)
+
+    def test_if_modified_since_alone(self):
+        """Одной даты мало для 304: после подписки и выхода страница новая"""
+        since = 'Fri, 01 Jan 2100 00:00:00 GMT'
+        follower = User.objects.create_user(username='follower')
+        client = Client()
+        client.force_login(follower)
+        for url in self.pages():
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertFalse(response.has_header('Last-Modified'))
+
+                client.get(reverse(
+                    'posts:profile_follow',
+                    kwargs={'username': self.username},
+                ))
+                followed = client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+                client.logout()
+                logged_out = client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+                client.force_login(follower)
+
+                self.assertEqual(followed.status_code, 200)
+                self.assertEqual(logged_out.status_code, 200)
+
+    def test_changes_invalidate(self):
+        """Правка поста и новый комментарий меняют ETag"""
+        etags = [self.guest_client.get(url)['ETag'] for url in self.pages()]
+
+        self.post.text = 'Новый текст'
+        self.post.save()
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+
+        for url, etag in zip(self.pages(), etags):
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_viewer_in_etag(self):
+        """ETag гостя не подходит авторизованному пользователю"""
+        url = self.pages()[0]
+        etag = self.guest_client.get(url)['ETag']
+
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_csrf_token_in_etag(self):
+        """После повторного входа страница с формой отдаётся заново"""
+        url = self.pages()[0]
+        login = reverse('users:login')
+        credentials = {'username': 'reader', 'password': 'Pa55-word'}
+        User.objects.create_user(**credentials)
+        client = Client()
+        client.post(login, credentials)
+        etag = client.get(url)['ETag']
+        client.logout()
+        client.post(login, credentials)
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_rows_past_last_page(self):
+        """Строки за последней страницей — строки последней, как в get_page"""
+        posts = Post.objects.filter(group=self.group)
+        factory = RequestFactory()
+        last_page = page_rows(posts, factory.get('/', {'page': 2}))
+
+        for page in ('99', '0', '-1'):
+            with self.subTest(page=page):
+                request = factory.get('/', {'page': page})
+                self.assertEqual(page_rows(posts, request), last_page)
+        self.assertEqual(
+            page_rows(posts, factory.get('/', {'page': 'abc'})),
+            page_rows(posts, factory.get('/')),
+        )
+        self.assertEqual(
+            len(last_page), self.post_count + 1 - settings.POSTS_IN_PAGE
+        )
 
 
 class PostSubscriptionsTest(PostsBaseTestCase):
@@ -489,3 +790,51 @@ class PostFollowTest(PostsBaseTestCase):
 
         response = user_1.get(self.url)
         self.assertEqual(0, len(response.context.get('page_obj')))
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка добавляет старые посты в ленту, отписка убирает"""
+        user_2 = User.objects.create_user(username='user_2')
+        client = Client()
+        client.force_login(user_2)
+
+        client.get(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': self.user.username}
+            )
+        )
+        response = client.get(self.url)
+        self.assertEqual(
+            len(response.context.get('page_obj')), settings.POSTS_IN_PAGE
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=user_2).count(),
+            Post.objects.filter(author=self.user).count()
+        )
+
+        client.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.user.username}
+            )
+        )
+        response = client.get(self.url)
+        self.assertEqual(0, len(response.context.get('page_obj')))
+        self.assertFalse(TimelineEntry.objects.filter(user=user_2).exists())
+
+    @override_settings(POSTS_PAGINATION='cursor')
+    def test_follow_cursor_pages(self):
+        """Лента подписок листается по курсору"""
+        user_2 = User.objects.create_user(username='user_2')
+        Follow.objects.create(user=user_2, author=self.user)
+        client = Client()
+        client.force_login(user_2)
+
+        first_page = client.get(self.url).context.get('page_obj')
+        second_page = client.get(
+            self.url, {'after': first_page.next_cursor}
+        ).context.get('page_obj')
+
+        self.assertEqual(len(first_page), settings.POSTS_IN_PAGE)
+        self.assertEqual(len(second_page), self.posts_on_second_page)
+        self.assertIsInstance(second_page[0], Post)
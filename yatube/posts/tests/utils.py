@@ -0,0 +1,78 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from posts.models import Group, Post
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def small_gif(name='small.gif'):
+    """Загруженная картинка 2×1 для полей ImageField."""
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif'
+    )
+
+
+class TempMediaMixin:
+    """MEDIA_ROOT во временном каталоге, который удаляется после класса."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+
+class PostsFixtureMixin(TempMediaMixin):
+    """Автор, две группы и пост автора в первой из них.
+
+    post_image — прикрепить к посту картинку uploaded.
+    """
+    username = 'auth'
+    title = 'Тестовая группа'
+    slug = 'test_slug'
+    description = 'Тестовое описание'
+    text = 'Тестовый текст поста'
+    post_image = False
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.uploaded = small_gif()
+        cls.user = User.objects.create_user(username=cls.username)
+        cls.group = Group.objects.create(
+            title=cls.title,
+            slug=cls.slug,
+            description=cls.description,
+        )
+        cls.group_for_edit = Group.objects.create(
+            title='Группа для редактирования',
+            slug='edit_slug',
+            description='any_descp',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text=cls.text,
+            group=cls.group,
+            image=cls.uploaded if cls.post_image else '',
+        )
@@ -0,0 +1,170 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDbKVStore
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core import jobs
+from core.profiling import measure
+
+from . import cache as page_cache
+from .models import ArchivedPost, Post
+
+logger = logging.getLogger(__name__)
+
+
+class LookupBackend(ThumbnailBackend):
+    """Ищет готовую миниатюру в KV-хранилище sorl, не создавая её."""
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """ImageFile миниатюры с тем же именем, что даст get_thumbnail."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_cached(self, file_, geometry_string, **options):
+        thumbnail = self.thumbnail_file(file_, geometry_string, **options)
+        return default.kvstore.get(thumbnail)
+
+
+lookup_backend = LookupBackend()
+
+
+def _pending_key(post_id):
+    return f'posts:thumbnail:pending:{post_id}'
+
+
+def _find_post(post_id):
+    for model in (Post, ArchivedPost):
+        post = (
+            model.objects.select_related('author', 'group')
+            .filter(pk=post_id).first()
+        )
+        if post is not None:
+            return post
+    return None
+
+
+def _touch(post):
+    """Сдвигает версию поста одним UPDATE и сбрасывает страницы с ним:
+    карточка могла закешироваться с заглушкой."""
+    type(post).objects.filter(pk=post.pk).update(
+        version=F('version') + 1, updated=timezone.now()
+    )
+    scopes = ['index', f'profile:{post.author.username}', f'post:{post.pk}']
+    if post.group is not None:
+        scopes.append(f'group:{post.group.slug}')
+    page_cache.bump(*scopes)
+
+
+def generate(post_id):
+    """Создаёт все миниатюры POST_THUMBNAIL_SIZES для картинки поста,
+    горячего или архивного."""
+    post = _find_post(post_id)
+    try:
+        if post is None or not post.image:
+            return
+        for geometry, options in settings.POST_THUMBNAIL_SIZES.items():
+            get_thumbnail(post.image, geometry, **options)
+        if settings.BACKGROUND_TASKS_ASYNC:
+            _touch(post)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры поста %s', post_id)
+    finally:
+        cache.delete(_pending_key(post_id))
+
+
+def schedule(post):
+    """Ставит создание миниатюр в очередь, если оно ещё не запланировано."""
+    if not post.image:
+        return
+    if cache.add(_pending_key(post.pk), True, settings.THUMBNAIL_PENDING_TTL):
+        jobs.enqueue(generate, post.pk, queue='thumbnails')
+
+
+def _get_raw_many(keys):
+    """Значения KV-хранилища sorl для ключей: один get_many в кеш
+    и один запрос в БД на все промахи."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDbKVStore):
+        return {key: kvstore._get_raw(key) for key in keys}
+    found = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        stored = dict(
+            KVStoreModel.objects
+            .filter(key__in=missing)
+            .values_list('key', 'value')
+        )
+        fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(fetched)
+    return {
+        key: value for key, value in found.items()
+        if value is not None and value != EMPTY_VALUE
+    }
+
+
+@measure('thumb')
+def prefetch(posts):
+    """Разрешает миниатюры всех постов страницы одним пакетом.
+
+    Результат кладётся в post.prefetched_thumbnails, откуда его
+    читает get_ready вместо отдельного похода в KV-хранилище.
+    """
+    keys = {}
+    for post in posts:
+        post.prefetched_thumbnails = {}
+        if not post.image:
+            continue
+        for geometry, options in settings.POST_THUMBNAIL_SIZES.items():
+            thumbnail = lookup_backend.thumbnail_file(
+                post.image, geometry, **options
+            )
+            keys[(post, geometry)] = add_prefix(thumbnail.key)
+    values = _get_raw_many(list(keys.values()))
+    for (post, geometry), key in keys.items():
+        value = values.get(key)
+        post.prefetched_thumbnails[geometry] = (
+            deserialize_image_file(value) if value else None
+        )
+    return posts
+
+
+@measure('thumb')
+def get_ready(post, geometry):
+    """Готовая миниатюра картинки поста или None, пока её нет."""
+    if not post.image:
+        return None
+    options = settings.POST_THUMBNAIL_SIZES[geometry]
+    prefetched = getattr(post, 'prefetched_thumbnails', {})
+    if geometry in prefetched:
+        thumbnail = prefetched[geometry]
+    else:
+        thumbnail = lookup_backend.get_cached(post.image, geometry, **options)
+    if thumbnail is None:
+        schedule(post)
+        if not settings.BACKGROUND_TASKS_ASYNC:
+            thumbnail = lookup_backend.get_cached(
+                post.image, geometry, **options
+            )
+    return thumbnail
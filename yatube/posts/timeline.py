@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.db import connections
+
+from .models import Follow, Post, TimelineEntry
+
+
+def _bulk_insert(entries):
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def fan_out_post(post_id):
+    """Раскладывает новый пост по лентам всех подписчиков автора."""
+    post = Post.objects.filter(pk=post_id).only('author_id', 'created')
+    post = post.first()
+    if post is None:
+        return
+    batch_size = settings.TIMELINE_BATCH_SIZE
+    last_id = 0
+    while True:
+        follows = list(
+            Follow.objects
+            .filter(author_id=post.author_id, id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'user_id')[:batch_size]
+        )
+        if not follows:
+            break
+        _bulk_insert([
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                created=post.created,
+            )
+            for _, user_id in follows
+        ])
+        last_id = follows[-1][0]
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика последние посты автора."""
+    posts = (
+        Post.objects
+        .filter(author_id=author_id)
+        .order_by('-created', '-id')
+        .values_list('id', 'created')[:settings.TIMELINE_BACKFILL_LIMIT]
+    )
+    batch = []
+    for post_id, created in posts:
+        batch.append(TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            created=created,
+        ))
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            _bulk_insert(batch)
+            batch = []
+    if batch:
+        _bulk_insert(batch)
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def _refresh_sql(connection):
+    """INSERT ... SELECT, раскладывающий последние посты автора
+    по лентам всех его подписчиков внутри базы."""
+    quote = connection.ops.quote_name
+    return (
+        f"{connection.ops.insert_statement(ignore_conflicts=True)} "
+        f"{quote(TimelineEntry._meta.db_table)} "
+        f"(user_id, post_id, author_id, created) "
+        f"SELECT f.user_id, p.id, p.author_id, p.created "
+        f"FROM {quote(Follow._meta.db_table)} f, ("
+        f"SELECT id, author_id, created FROM {quote(Post._meta.db_table)} "
+        f"WHERE author_id = %s ORDER BY created DESC, id DESC LIMIT %s"
+        f") p WHERE f.author_id = %s "
+        f"{connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}"
+    )
+
+
+def refresh_authors(author_ids):
+    """Заново наполняет ленты всех подписчиков авторов author_ids.
+
+    Нужна после массового импорта, который обходит сигналы. Строки
+    ленты не проходят через Python: один INSERT ... SELECT на автора.
+    """
+    connection = connections[TimelineEntry.objects.db]
+    sql = _refresh_sql(connection)
+    limit = settings.TIMELINE_BACKFILL_LIMIT
+    with connection.cursor() as cursor:
+        for author_id in sorted(author_ids):
+            cursor.execute(sql, [author_id, limit, author_id])
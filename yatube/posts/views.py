@@ -1,23 +1,60 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post, Group, User, Follow
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from .models import ArchivedPost, Post, Group, User, TimelineEntry
 from django.contrib.auth.decorators import login_required
-from .forms import PostForm, CommentForm
-from .paginator import paginator
-from django.views.decorators.cache import cache_page
+from .forms import PostForm, CommentForm, SearchForm
+from .paginator import CursorPaginator, decode_cursor, page_rows, paginator
+from . import archive, export, follow_graph, thumbnails
+from .search import search_posts
+from .cache import (
+    cache_page_by_generation, conditional_page,
+    index_scopes, group_scopes, profile_scopes, detail_scopes
+)
+from django.db import transaction
 
+from core.replicas import read_from_replica
 
-@cache_page(20, key_prefix='index_page')
+
+@read_from_replica
+@cache_page_by_generation(index_scopes)
 def index(request):
     """Главная страница"""
     template = 'posts/index.html'
-    post_list = Post.objects.all()
+    post_list = Post.objects.select_related('author', 'group')
+    page_obj = paginator(post_list, request)
+    thumbnails.prefetch(page_obj)
     context = {
         'title': 'Последние обновления на сайте',
-        'page_obj': paginator(post_list, request),
+        'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
+def _group_rows(request, slug):
+    return page_rows(Post.objects.filter(group__slug=slug), request)
+
+
+def _profile_rows(request, username):
+    return page_rows(
+        Post.objects.filter(author__username=username), request
+    )
+
+
+def _detail_rows(request, post_id):
+    # Счётчик постов автора виден на странице, но не меняет updated.
+    return [
+        (f'{pk}:{posts_count}', updated)
+        for pk, posts_count, updated in Post.objects.filter(
+            pk=post_id
+        ).values_list('id', 'author__counters__posts_count', 'updated')
+    ]
+
+
+@read_from_replica
+@conditional_page(_group_rows, group_scopes)
+@cache_page_by_generation(group_scopes)
 def group_posts(request, slug):
     """Страница группы постов"""
     template = 'posts/group_list.html'
@@ -25,38 +62,42 @@ def group_posts(request, slug):
     post_list = (
         Post
         .objects
+        .select_related('author', 'group')
         .filter(group=group)
     )
+    page_obj = paginator(post_list, request)
+    thumbnails.prefetch(page_obj)
     context = {
         'group': group,
-        'page_obj': paginator(post_list, request)
+        'page_obj': page_obj
     }
     return render(request, template, context)
 
 
+@read_from_replica
+@conditional_page(_profile_rows, profile_scopes)
+@cache_page_by_generation(profile_scopes)
 def profile(request, username):
     """Профаил пользователя"""
     template = 'posts/profile.html'
-    following = False
-    author = User.objects.get(username=username)
-    follow_list = []
-    if request.user.is_authenticated:
-        followings = list(
-            Follow.objects.select_related(
-                'user'
-            ).
-            filter(
-                user_id=request.user
-            )
-        )
-        for i in followings:
-            follow_list.append(i.author_id)
-        following = author.id in follow_list
+    author = get_object_or_404(
+        User.objects.select_related('counters'),
+        username=username
+    )
+    following = follow_graph.is_following(request.user, author)
     user_not_author = request.user != author
-    post_list = Post.objects.select_related('author').filter(author_id=author)
+    post_list = (
+        Post
+        .objects
+        .select_related('author', 'group')
+        .filter(author_id=author)
+    )
+    post_list = archive.with_archived(post_list, author)
 
+    page_obj = paginator(post_list, request)
+    thumbnails.prefetch(page_obj)
     context = {
-        'page_obj': paginator(post_list, request),
+        'page_obj': page_obj,
         'author': author,
         'following': following,
         'user_not_author': user_not_author
@@ -64,30 +105,103 @@ def profile(request, username):
     return render(request, template, context)
 
 
+def search(request):
+    """Поиск по тексту постов"""
+    template = 'posts/search.html'
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid():
+        post_list = search_posts(
+            form.cleaned_data['q'],
+            group=form.cleaned_data['group'],
+            author=form.cleaned_data['author'],
+        )
+        page_obj = paginator(post_list, request)
+        thumbnails.prefetch(page_obj)
+    query = request.GET.copy()
+    for key in ('page', 'after', 'before'):
+        query.pop(key, None)
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+        'page_query': query.urlencode() + '&' if query else '',
+    }
+    return render(request, template, context)
+
+
+@read_from_replica
+@conditional_page(_detail_rows, detail_scopes)
 def post_detail(request, post_id):
     """Страница подробной информации о посте"""
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    post = (
+        Post.objects.select_related('author__counters', 'group')
+        .filter(id=post_id)
+        .first()
+    ) or archive.get_archived_post(
+        post_id,
+        ArchivedPost.objects.select_related('author__counters', 'group'),
+    )
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
         'form': form,
-        'comments': comments
+        'comments': _comments_page(post, request),
     }
     return render(request, template, context)
 
 
+def _comments_page(post, request):
+    """Keyset-страница комментариев поста, новые первыми."""
+    comments = CursorPaginator(
+        post.comments.select_related('author'), settings.COMMENTS_IN_PAGE
+    )
+    return comments.get_cursor_page(
+        after=decode_cursor(request.GET.get('after'))
+    )
+
+
+def post_comments(request, post_id):
+    """Следующая порция комментариев: HTML-фрагмент или JSON"""
+    post = (
+        Post.objects.only('id').filter(id=post_id).first()
+        or archive.get_archived_post(post_id, ArchivedPost.objects.only('id'))
+    )
+    comments = _comments_page(post, request)
+    if request.GET.get('format') != 'json':
+        return render(request, 'posts/includes/comment_list.html', {
+            'post': post,
+            'comments': comments,
+        })
+    return JsonResponse({
+        'comments': [
+            {
+                'id': comment.pk,
+                'author': comment.author.username,
+                'author_url': reverse(
+                    'posts:profile', args=[comment.author.username]
+                ),
+                'text': comment.text,
+                'created': comment.created.isoformat(),
+            }
+            for comment in comments
+        ],
+        'next': comments.next_cursor,
+    })
+
+
 @login_required
 def post_create(request):
     """Страница создания поста"""
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     template = 'posts/create_post.html'
     if request.method == 'POST':
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            post.save()
+            with transaction.atomic():
+                post.save()
+            thumbnails.schedule(post)
             return redirect("posts:profile", post.author)
     return render(request, template, {'form': form})
 
@@ -107,6 +221,8 @@ def post_edit(request, post_id):
     if request.method == 'POST':
         if form.is_valid():
             form.save()
+            if 'image' in form.changed_data:
+                thumbnails.schedule(post)
             return redirect("posts:post_detail", post_id)
         return render(request, template, {'form': form})
     context = {
@@ -125,33 +241,30 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@read_from_replica
 def follow_index(request):
     """Страница подписки"""
-    current_user = request.user
     template = 'posts/follow.html'
-    follow_list = []
-    followings = list(
-        Follow.objects.select_related(
-            'user'
-        ).
-        filter(
-            user_id=current_user
-        )
+    entries = (
+        TimelineEntry
+        .objects
+        .select_related('post__author', 'post__group')
+        .filter(user=request.user)
     )
-    for i in followings:
-        follow_list.append(i.author_id)
-    post_list = Post.objects.select_related('author').filter(
-        author__in=follow_list
+    page_obj = paginator(
+        entries, request, cursor_fields=('created', 'post_id')
     )
+    page_obj.object_list = [entry.post for entry in page_obj]
+    thumbnails.prefetch(page_obj)
     context = {
         'title': 'Страница подписки',
-        'page_obj': paginator(post_list, request),
-        'follow_list': follow_list
+        'page_obj': page_obj,
     }
     return render(request, template, context)
 
@@ -159,18 +272,78 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     """Подписаться на автора"""
-    user = User.objects.get(username=request.user)
-    author = User.objects.get(username=username)
-    if user != author:
-        Follow.objects.create(user=user, author=author)
+    author = get_object_or_404(User, username=username)
+    follow_graph.follow(request.user, author)
     return redirect('posts:follow_index')
 
 
 @login_required
 def profile_unfollow(request, username):
     """Одписаться на автора"""
-    user = User.objects.get(username=request.user)
-    author = User.objects.get(username=username)
-    if user != author:
-        Follow.objects.filter(user=user, author=author).delete()
+    author = get_object_or_404(User, username=username)
+    follow_graph.unfollow(request.user, author)
     return redirect('posts:follow_index')
+
+
+def _follow_list(request, username, title, get_page):
+    author = get_object_or_404(User, username=username)
+    try:
+        after = int(request.GET['after'])
+    except (KeyError, ValueError):
+        after = None
+    context = {
+        'title': title,
+        'author': author,
+        'page_obj': get_page(author, after=after),
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+def followers(request, username):
+    """Подписчики автора"""
+    return _follow_list(
+        request, username, 'Подписчики', follow_graph.followers
+    )
+
+
+def following(request, username):
+    """Подписки пользователя"""
+    return _follow_list(
+        request, username, 'Подписки', follow_graph.following
+    )
+
+
+def _export_response(request, name, **lookups):
+    file_format = request.GET.get('format', 'jsonl')
+    if file_format not in export.FORMATS:
+        raise Http404('Неизвестный формат выгрузки')
+    response = StreamingHttpResponse(
+        export.iter_lines(export.iter_records(**lookups), file_format),
+        content_type=export.FORMATS[file_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{name}.{file_format}"'
+    )
+    return response
+
+
+@login_required
+def group_export(request, slug):
+    """Выгрузка постов группы с комментариями (для staff)"""
+    group = get_object_or_404(Group, slug=slug)
+    if not request.user.is_staff:
+        raise Http404
+    return _export_response(
+        request, f'group-{group.slug}', group=group
+    )
+
+
+@login_required
+def profile_export(request, username):
+    """Выгрузка постов автора с комментариями (автору и staff)"""
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        raise Http404
+    return _export_response(
+        request, f'profile-{author.username}', author=author
+    )
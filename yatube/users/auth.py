@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from core.invalidation import now_and_on_commit
+
+
+def _user_key(user_id):
+    return f'users:user:{user_id}'
+
+
+def cached_user(user_id, backend_path):
+    """Пользователь по id из кеша; при промахе — через бэкенд сессии."""
+    key = _user_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = auth.load_backend(backend_path).get_user(user_id)
+        if user is None:
+            return None
+        cache.set(key, user, settings.AUTH_USER_CACHE_TTL)
+    user.backend = backend_path
+    return user
+
+
+def invalidate(*user_ids):
+    """Сбрасывает закешированных пользователей (см. now_and_on_commit)."""
+    keys = [_user_key(user_id) for user_id in user_ids]
+    now_and_on_commit(cache.delete_many, keys)
+
+
+def _hash_matches(request, user):
+    session_hash = request.session.get(auth.HASH_SESSION_KEY)
+    return bool(session_hash and constant_time_compare(
+        session_hash, user.get_session_auth_hash()
+    ))
+
+
+def get_user(request):
+    """То же, что django.contrib.auth.get_user, но пользователь
+    берётся из кеша. Хеш пароля в сессии сверяется как обычно."""
+    try:
+        user_id = auth.get_user_model()._meta.pk.to_python(
+            request.session[auth.SESSION_KEY]
+        )
+        backend_path = request.session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+    user = cached_user(user_id, backend_path)
+    if user is not None and not _hash_matches(request, user):
+        # Кеш мог отстать от смены пароля: прежде чем завершать
+        # сессию, сверяемся с БД.
+        cache.delete(_user_key(user_id))
+        user = cached_user(user_id, backend_path)
+    if user is None:
+        return AnonymousUser()
+    if not _hash_matches(request, user):
+        request.session.flush()
+        return AnonymousUser()
+    return user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware, у которого request.user не стоит
+    запросов к БД при тёплом кеше (и сессии в cached_db)."""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
@@ -1,11 +1,66 @@
-from django.contrib.auth.forms import UserCreationForm
+import time
+
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
 from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from core import jobs
 
 
 User = get_user_model()
 
+RESET_EMAIL_INTERVAL = 10 * 60
+
 
 class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+
+def send_password_reset(user_id, subject_template_name, email_template_name,
+                        context, from_email, to_email,
+                        html_email_template_name=None):
+    """Задача очереди: отправляет письмо сброса пароля.
+
+    Ссылка со свежим токеном строится здесь, в воркере: в строке
+    задачи токен лежал бы открытым текстом.
+    """
+    user = User.objects.get(pk=user_id)
+    context.update(
+        user=user,
+        uid=urlsafe_base64_encode(force_bytes(user.pk)),
+        token=default_token_generator.make_token(user),
+    )
+    PasswordResetForm().send_mail(
+        subject_template_name, email_template_name, context,
+        from_email, to_email, html_email_template_name,
+    )
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """Письмо сброса пароля уходит через очередь, а не в запросе.
+
+    Повторные запросы сброса за RESET_EMAIL_INTERVAL секунд дают
+    одно письмо.
+    """
+
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email,
+                  html_email_template_name=None):
+        user = context['user']
+        context = {
+            key: value for key, value in context.items()
+            if key not in ('user', 'uid', 'token')
+        }
+        interval = int(time.time() // RESET_EMAIL_INTERVAL)
+        jobs.enqueue(
+            send_password_reset, user.pk, subject_template_name,
+            email_template_name, context, from_email, to_email,
+            html_email_template_name,
+            queue='email',
+            priority=jobs.PRIORITY_HIGH,
+            key=f'password-reset:{user.pk}:{interval}',
+        )
@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model, user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import auth
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _user_changed(sender, instance, **kwargs):
+    # Смена пароля, правка профиля и last_login при входе
+    # сохраняют пользователя — кеш сбрасывается здесь.
+    auth.invalidate(instance.pk)
+
+
+@receiver(user_logged_out)
+def _user_logged_out(sender, request, user, **kwargs):
+    if user is not None:
+        auth.invalidate(user.pk)
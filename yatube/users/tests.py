@@ -0,0 +1,169 @@
+import re
+import time
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import Job
+from posts.models import Follow, Post
+from users.auth import _user_key
+
+User = get_user_model()
+
+AUTH_TABLES = ('FROM "django_session"', 'FROM "auth_user"')
+
+
+@override_settings(
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    AUTH_USER_CACHE_TTL=60 * 60,
+)
+class CachedAuthTests(TestCase):
+    """Как с общим кешем: сессия и пользователь живут в нём долго."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(
+            username='reader', password='old-password-1'
+        )
+        Post.objects.create(author=cls.author, text='Пост')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.login(username='reader', password='old-password-1')
+
+    def auth_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            query['sql'] for query in queries
+            if any(table in query['sql'] for table in AUTH_TABLES)
+        ]
+
+    def test_warm_cache_without_auth_queries(self):
+        """На тёплом кеше сессия и пользователь не читаются из БД."""
+        urls = (
+            reverse('posts:follow_index'),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.auth_queries(url)
+                self.assertEqual(self.auth_queries(url), [])
+
+    def test_cold_cache_falls_back_to_db(self):
+        """После очистки кеша сессия и пользователь читаются из БД."""
+        url = reverse('posts:follow_index')
+        cache.clear()
+        self.assertEqual(len(self.auth_queries(url)), 2)
+        self.assertEqual(self.auth_queries(url), [])
+
+    def test_user_changes_invalidate_cache(self):
+        """Правка пользователя сразу видна в следующем запросе."""
+        url = reverse('posts:follow_index')
+        self.auth_queries(url)
+        reader = User.objects.get(pk=self.reader.pk)
+        reader.first_name = 'Новое имя'
+        reader.save()
+        response = self.client.get(url)
+        self.assertEqual(response.wsgi_request.user.first_name, 'Новое имя')
+
+    def test_password_change_logs_out_other_sessions(self):
+        """Смена пароля завершает остальные сессии."""
+        other = Client()
+        other.login(username='reader', password='old-password-1')
+        url = reverse('posts:follow_index')
+        other.get(url)
+        response = self.client.post(reverse('users:password_change'), {
+            'old_password': 'old-password-1',
+            'new_password1': 'new-password-2',
+            'new_password2': 'new-password-2',
+        })
+        self.assertRedirects(response, reverse('users:password_change_done'))
+        self.assertTrue(
+            self.client.get(url).wsgi_request.user.is_authenticated
+        )
+        self.assertFalse(other.get(url).wsgi_request.user.is_authenticated)
+
+    def test_logout(self):
+        """После выхода пользователь анонимен, а кеш сброшен."""
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        self.client.get(reverse('users:logout'))
+        response = self.client.get(url)
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+
+class LocalCacheAuthTests(TestCase):
+    """С кешем процесса, который не видит сбросов из других воркеров."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='reader', password='old-password-1'
+        )
+        self.url = reverse('posts:index')
+
+    @override_settings(AUTH_USER_CACHE_TTL=0.05)
+    def test_blocked_user_expires(self):
+        """Блокировка в обход сигналов видна через несколько секунд"""
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        # Так сброс кеша в другом процессе выглядит для этого.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        time.sleep(0.1)
+
+        response = self.client.get(self.url)
+
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    def test_stale_password_hash_rechecked(self):
+        """Устаревший в кеше хеш пароля не завершает новую сессию"""
+        stale = User.objects.get(pk=self.user.pk)
+        self.user.set_password('new-password-2')
+        self.user.save()
+        self.client.login(username='reader', password='new-password-2')
+        stale.backend = 'django.contrib.auth.backends.ModelBackend'
+        cache.set(_user_key(self.user.pk), stale)
+
+        response = self.client.get(self.url)
+
+        self.assertTrue(response.wsgi_request.user.is_authenticated)
+
+
+@override_settings(BACKGROUND_TASKS_ASYNC=True)
+class PasswordResetQueueTests(TestCase):
+    def test_email_sent_by_worker(self):
+        """Письмо сброса пароля отправляет воркер очереди, а не запрос."""
+        User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass'
+        )
+        data = {'email': 'reader@example.com'}
+
+        self.client.post(reverse('users:password_reset'), data)
+        self.client.post(reverse('users:password_reset'), data)
+
+        self.assertEqual(len(mail.outbox), 0)
+        job = Job.objects.get(queue='email')
+        self.assertEqual(job.func, 'users.forms.send_password_reset')
+        for field in (job.args, job.idempotency_key):
+            with self.subTest(field=field):
+                self.assertNotIn('token', field)
+                self.assertNotIn('uid', field)
+        call_command('run_jobs', once=True, processes=0, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['reader@example.com'])
+        link = re.search(r'http://\S+/auth/reset/\S+', mail.outbox[0].body)
+        response = self.client.get(link.group(0), follow=True)
+        self.assertTrue(response.context['validlink'])
@@ -32,11 +32,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.auth.CachedAuthenticationMiddleware',
+    'core.replicas.PinAfterWriteMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -71,6 +73,29 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения, например YATUBE_DB_REPLICAS=replica1,replica2.
+# Локально это файлы SQLite, которые обновляет команда replicate.
+DATABASE_REPLICAS = [
+    alias
+    for alias in os.environ.get('YATUBE_DB_REPLICAS', '').split(',')
+    if alias
+]
+
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+
+# Сколько секунд после записи пользователь читает с основной базы.
+REPLICA_PIN_SECONDS = 10
+
+# Сколько хранится страница, собранная по данным реплики.
+REPLICA_PAGE_TTL = 30
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -103,8 +128,19 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
+STATIC_ROOT = os.path.join(BASE_DIR, 'static_root')
+
+# collectstatic добавляет хеш содержимого в имена и пишет рядом
+# сжатые .gz и .br; шаблонный тег static ссылается на эти имена.
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+
 POSTS_IN_PAGE = 10
 
+COMMENTS_IN_PAGE = 20
+
+# 'offset' — нумерованные страницы, 'cursor' — keyset-пагинация ?after=/?before=
+POSTS_PAGINATION = 'offset'
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -117,8 +153,112 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+# Каталоги MEDIA_ROOT, которые можно отдавать: картинки постов и миниатюры.
+MEDIA_SERVED_DIRS = ('posts/', 'cache/')
+
+# Кто отдаёт байты медиафайлов после проверки доступа:
+# None — сам Django (FileResponse с Range), 'nginx' — X-Accel-Redirect
+# на internal-location MEDIA_ACCEL_PREFIX, 'apache' — X-Sendfile.
+MEDIA_SENDFILE_BACKEND = None
+
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Медленная работа (рассылка постов по лентам, миниатюры, письма) уходит
+# в очередь задач core.jobs; её выполняет команда run_jobs.
+# В разработке и тестах задачи выполняются сразу, синхронно.
+BACKGROUND_TASKS_ASYNC = not DEBUG
+
+# Очереди задач и сколько задач каждой выполняется одновременно.
+JOB_QUEUES = {
+    'default': 2,
+    'timeline': 2,
+    'thumbnails': 2,
+    'email': 1,
+}
+
+JOB_MAX_ATTEMPTS = 5
+
+# Пауза перед повтором: JOB_RETRY_DELAY * 2 ** (попытка - 1) секунд,
+# но не больше JOB_RETRY_MAX_DELAY.
+JOB_RETRY_DELAY = 10
+
+JOB_RETRY_MAX_DELAY = 60 * 60
+
+# Задача, за которую воркер столько секунд не отметился, считается
+# брошенной и повторяется. Работающий воркер отмечается каждую треть срока.
+JOB_TIMEOUT = 10 * 60
+
+# Сколько дней хранить выполненные задачи.
+JOB_KEEP_DAYS = 7
+
+TIMELINE_BATCH_SIZE = 500
+
+TIMELINE_BACKFILL_LIMIT = 1000
+
+# Миниатюры картинок постов, создаются заранее при сохранении поста.
+POST_THUMBNAIL_SIZES = {
+    '960x339': {'crop': 'center', 'upscale': True},
 }
+
+THUMBNAIL_PENDING_TTL = 60
+
+# Server-Timing и строка лога core.profiling для каждого запроса.
+REQUEST_PROFILING = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Поколения кеша, закешированные страницы, сессии и пользователи должны
+# быть общими для всех процессов: иначе сброс в одном воркере не виден
+# остальным. Общий кеш — memcached из YATUBE_MEMCACHED (host:port, нужен
+# пакет python-memcached). Без него у каждого процесса свой кеш,
+# и закешированное живёт недолго.
+MEMCACHED_LOCATION = os.environ.get('YATUBE_MEMCACHED')
+
+CACHE_IS_SHARED = bool(MEMCACHED_LOCATION)
+
+if CACHE_IS_SHARED:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': MEMCACHED_LOCATION,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Сколько хранится страница: с общим кешем — до смены поколения,
+# с кешем процесса — недолго, чтобы чужой сброс поколения не терялся.
+PAGE_CACHE_TIMEOUT = None if CACHE_IS_SHARED else 20
+
+# Сессия и пользователь запроса читаются из общего кеша; БД — только
+# при промахе. С кешем процесса выход, смена пароля и блокировка в одном
+# воркере не сбросили бы его в остальных, поэтому сессия хранится в БД,
+# а пользователь кешируется на несколько секунд.
+if CACHE_IS_SHARED:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+AUTH_USER_CACHE_TTL = 60 * 60 if CACHE_IS_SHARED else 5
+
+# Сколько хранить в кеше множество подписок пользователя. Сброс при
+# подписке виден только своему процессу, поэтому без общего кеша
+# подписки кешируются на несколько секунд.
+FOLLOW_CACHE_TTL = 60 * 60 * 24 if CACHE_IS_SHARED else 5
@@ -1,7 +1,8 @@
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from core.views import media_file, static_file
 
 handler404 = 'core.views.page_not_found'
 
@@ -14,9 +15,14 @@ urlpatterns = [
     path('about/', include('about.urls', namespace='about')),
     path('profile/', include('posts.urls', namespace='profile')),
     path('posts/', include('posts.urls', namespace='post_detail')),
+    re_path(
+        r'^{}(?P<path>.+)$'.format(settings.STATIC_URL.lstrip('/')),
+        static_file,
+        name='static'
+    ),
+    re_path(
+        r'^{}(?P<path>.+)$'.format(settings.MEDIA_URL.lstrip('/')),
+        media_file,
+        name='media'
+    ),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )